@@ -5,21 +5,114 @@ Detailed battery consumption analysis for BLE operations
 """
 
 import os
+import re
+import selectors
 import sys
 import time
 import json
+import logging
 import subprocess
 import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from dataclasses import dataclass, field
-import matplotlib.pyplot as plt
 import numpy as np
 
-@dataclass
-class BatterySnapshot:
+logger = logging.getLogger("battery_tracker")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Matches the "key: value" lines of `dumpsys battery` we care about
+_BATTERY_RE = re.compile(rb'^\s*(level|voltage|temperature|status):\s*(.*?)\s*$', re.M)
+
+# Field name and value conversion for each dumpsys battery key
+_BATTERY_FIELDS = {
+    b'level': ('level', int),
+    b'voltage': ('voltage', int),
+    b'temperature': ('temperature', lambda v: int(v) / 10),
+    b'status': ('charging', lambda v: b'Charging' in v),
+}
+
+# Matches the battery keys of /sys/class/power_supply/battery/uevent
+_UEVENT_RE = re.compile(rb'^POWER_SUPPLY_(CAPACITY|VOLTAGE_NOW|TEMP|CURRENT_NOW|STATUS)=(\S+)', re.M)
+
+# Field name and value conversion for each uevent key (sysfs reports uV, uA and 0.1 C)
+_UEVENT_FIELDS = {
+    b'CAPACITY': ('level', int),
+    b'VOLTAGE_NOW': ('voltage', lambda v: int(v) / 1000),
+    b'TEMP': ('temperature', lambda v: int(v) / 10),
+    b'CURRENT_NOW': ('current', lambda v: abs(int(v)) / 1000),
+    b'STATUS': ('charging', lambda v: v == b'Charging'),
+}
+
+# Matches the battery keys reported by `ideviceinfo -q com.apple.mobile.battery`
+_IOS_BATTERY_RE = re.compile(
+    rb'^\s*(BatteryCurrentCapacity|Voltage|Temperature|InstantAmperage|(?:Battery)?IsCharging):\s*(\S+)',
+    re.M
+)
+
+# Field name and value conversion for each ideviceinfo battery key
+_IOS_BATTERY_FIELDS = {
+    b'BatteryCurrentCapacity': ('level', int),
+    b'Voltage': ('voltage', float),
+    b'Temperature': ('temperature', lambda v: float(v) / 100),
+    b'InstantAmperage': ('current', lambda v: abs(int(v))),
+    b'IsCharging': ('charging', lambda v: v.lower() == b'true'),
+    b'BatteryIsCharging': ('charging', lambda v: v.lower() == b'true'),
+}
+
+# Fixed voltage, temperature, current, power and charging fields of simulated iOS samples
+_SIMULATED_IOS_TAIL = (3800.0, 32.0, 150.0, 570.0, False)
+
+# Device-side triggers for each test action
+_ANDROID_ACTIONS = {
+    "start_scan": "com.bitcraps.START_BLE_SCAN",
+    "stop_scan": "com.bitcraps.STOP_BLE_SCAN",
+    "start_advertise": "com.bitcraps.START_BLE_ADVERTISE",
+    "stop_advertise": "com.bitcraps.STOP_BLE_ADVERTISE",
+    "start_transfer": "com.bitcraps.START_DATA_TRANSFER",
+    "stop_transfer": "com.bitcraps.STOP_DATA_TRANSFER",
+}
+_IOS_PAYLOADS = {action: json.dumps({"action": action}).encode() for action in _ANDROID_ACTIONS}
+
+def _json_bytes(obj) -> bytes:
+    """Serialize to compact JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _phase_stats(level, power, n):
+        """Drain, average power and peak power of the first n samples in one pass"""
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        total = 0.0
+        peak = power[0]
+        for i in range(n):
+            total += power[i]
+            if power[i] > peak:
+                peak = power[i]
+        return level[0] - level[n - 1], total / n, peak
+else:
+    def _phase_stats(level, power, n):
+        """Drain, average power and peak power of the first n samples"""
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        samples = power[:n]
+        return float(level[0] - level[n - 1]), float(samples.mean()), float(samples.max())
+
+class BatterySnapshot(NamedTuple):
     """Single battery measurement"""
-    timestamp: datetime
+    timestamp_ns: int  # time.monotonic_ns() at capture
     level: float  # Battery percentage
     voltage: float  # Voltage in mV
     temperature: float  # Temperature in Celsius
@@ -27,13 +120,68 @@ class BatterySnapshot:
     power: float  # Power consumption in mW
     charging: bool
     
+# Raw measurement in BatterySnapshot field order, used on the sampling path
+BatterySample = Tuple[int, float, float, float, float, float, bool]
+    
 @dataclass
 class BatteryTestPhase:
-    """Test phase with battery measurements"""
+    """Test phase with battery measurements stored as columnar arrays"""
     name: str
     start_time: datetime
     end_time: Optional[datetime] = None
-    snapshots: List[BatterySnapshot] = field(default_factory=list)
+    capacity: int = 256
+    start_ns: int = field(default_factory=time.monotonic_ns)  # Monotonic anchor for start_time
+    
+    def __post_init__(self):
+        self.n = 0
+        self.timestamp_ns = np.empty(self.capacity, dtype=np.int64)
+        self.level = np.empty(self.capacity, dtype=np.float64)
+        self.voltage = np.empty(self.capacity, dtype=np.float64)
+        self.temperature = np.empty(self.capacity, dtype=np.float64)
+        self.current = np.empty(self.capacity, dtype=np.float64)
+        self.power = np.empty(self.capacity, dtype=np.float64)
+        self.charging = np.empty(self.capacity, dtype=np.bool_)
+        
+    def _grow(self):
+        """Double the capacity of every column"""
+        self.capacity *= 2
+        for column in ('timestamp_ns', 'level', 'voltage', 'temperature', 'current', 'power', 'charging'):
+            setattr(self, column, np.resize(getattr(self, column), self.capacity))
+            
+    def push(self, timestamp_ns: int, level: float, voltage: float, temperature: float,
+             current: float, power: float, charging: bool):
+        """Append one measurement"""
+        if self.n == self.capacity:
+            self._grow()
+        i = self.n
+        self.timestamp_ns[i] = timestamp_ns
+        self.level[i] = level
+        self.voltage[i] = voltage
+        self.temperature[i] = temperature
+        self.current[i] = current
+        self.power[i] = power
+        self.charging[i] = charging
+        self.n = i + 1
+        
+    @property
+    def snapshots(self) -> List[BatterySnapshot]:
+        """Materialize the recorded measurements as BatterySnapshot objects"""
+        n = self.n
+        return list(map(BatterySnapshot._make, zip(
+            self.timestamp_ns[:n].tolist(), self.level[:n].tolist(),
+            self.voltage[:n].tolist(), self.temperature[:n].tolist(),
+            self.current[:n].tolist(), self.power[:n].tolist(),
+            self.charging[:n].tolist()
+        )))
+    
+    @property
+    def elapsed_s(self) -> np.ndarray:
+        """Seconds since phase start for each recorded measurement"""
+        return (self.timestamp_ns[:self.n] - self.start_ns) * 1e-9
+        
+    def wall_time(self, timestamp_ns: int) -> datetime:
+        """Convert a monotonic timestamp to wall-clock time"""
+        return self.start_time + timedelta(microseconds=(timestamp_ns - self.start_ns) // 1000)
     
     @property
     def duration(self) -> timedelta:
@@ -43,27 +191,32 @@ class BatteryTestPhase:
         
     @property
     def battery_drain(self) -> float:
-        if len(self.snapshots) >= 2:
-            return self.snapshots[0].level - self.snapshots[-1].level
+        if self.n >= 2:
+            return float(self.level[0] - self.level[self.n - 1])
         return 0.0
         
     @property
     def average_power(self) -> float:
-        if self.snapshots:
-            return sum(s.power for s in self.snapshots) / len(self.snapshots)
+        if self.n:
+            return float(self.power[:self.n].mean())
         return 0.0
 
 class BatteryTracker:
     """Base battery tracking class"""
     
-    def __init__(self, device_id: str, platform: str):
+    def __init__(self, device_id: str, platform: str, interval: float = 1.0):
         self.device_id = device_id
         self.platform = platform
+        self.interval = interval  # Seconds between samples
         self.current_phase: Optional[BatteryTestPhase] = None
         self.phases: List[BatteryTestPhase] = []
-        self.monitoring = False
+        self._stop = threading.Event()
         self.monitor_thread = None
         
+    @property
+    def monitoring(self) -> bool:
+        return self.monitor_thread is not None and not self._stop.is_set()
+        
     def start_phase(self, phase_name: str):
         """Start a new test phase"""
         if self.current_phase:
@@ -73,97 +226,185 @@ class BatteryTracker:
             name=phase_name,
             start_time=datetime.now()
         )
-        print(f"Started phase: {phase_name}")
+        logger.info("Started phase: %s", phase_name)
         
     def end_phase(self):
         """End current test phase"""
         if self.current_phase:
             self.current_phase.end_time = datetime.now()
             self.phases.append(self.current_phase)
-            print(f"Ended phase: {self.current_phase.name}")
-            print(f"  Duration: {self.current_phase.duration}")
-            print(f"  Battery drain: {self.current_phase.battery_drain:.2f}%")
-            print(f"  Average power: {self.current_phase.average_power:.2f} mW")
+            phase = self.current_phase
             self.current_phase = None
+            logger.info(
+                "Ended phase: %s\n  Duration: %s\n  Battery drain: %.2f%%\n  Average power: %.2f mW",
+                phase.name, phase.duration, phase.battery_drain, phase.average_power
+            )
             
     def start_monitoring(self):
         """Start background monitoring"""
-        self.monitoring = True
+        if self.monitoring:
+            return
+        self._stop.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.start()
         
     def stop_monitoring(self):
         """Stop background monitoring"""
-        self.monitoring = False
+        self._stop.set()
         if self.monitor_thread:
             self.monitor_thread.join()
+            self.monitor_thread = None
         if self.current_phase:
             self.end_phase()
             
     def _monitor_loop(self):
         """Background monitoring loop"""
-        while self.monitoring:
-            snapshot = self.get_battery_snapshot()
-            if snapshot and self.current_phase:
-                self.current_phase.snapshots.append(snapshot)
-            time.sleep(1)  # Sample every second
+        while not self._stop.is_set():
+            sample = self.read_sample()
+            phase = self.current_phase
+            if sample and phase:
+                phase.push(*sample)
+            if self._stop.wait(self.interval):
+                break
             
     def get_battery_snapshot(self) -> Optional[BatterySnapshot]:
-        """Get current battery snapshot - to be implemented by subclasses"""
+        """Get current battery snapshot"""
+        sample = self.read_sample()
+        return BatterySnapshot._make(sample) if sample else None
+        
+    def read_sample(self) -> Optional[BatterySample]:
+        """Read one raw measurement tuple - to be implemented by subclasses"""
         raise NotImplementedError
 
 class AndroidBatteryTracker(BatteryTracker):
     """Android battery tracking"""
     
+    END_MARKER = b"__BITCRAPS_END__"
+    SEP_MARKER = b"__BITCRAPS_SEP__"
+    # Seconds to wait for one command's output before restarting the shell
+    SHELL_TIMEOUT = 5
+    UEVENT_CMD = b"cat /sys/class/power_supply/battery/uevent"
+    DUMPSYS_CMD = (
+        b"dumpsys battery; echo " + SEP_MARKER + b"; "
+        b"cat /sys/class/power_supply/battery/current_now"
+    )
+    
     def __init__(self, device_id: str):
         super().__init__(device_id, "android")
+        self.shell: Optional[subprocess.Popen] = None
+        self.use_uevent = True
+        
+    def _open_shell(self) -> subprocess.Popen:
+        """Start (or reuse) a long-lived adb shell session"""
+        if self.shell is None or self.shell.poll() is not None:
+            self.shell = subprocess.Popen(
+                ["adb", "-s", self.device_id, "shell"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self.shell
+        
+    def _run(self, cmd: bytes) -> bytes:
+        """Run a command through the persistent shell and return its raw output
+        
+        Raises subprocess.TimeoutExpired if the output doesn't complete within
+        SHELL_TIMEOUT; the shell is killed and respawned on the next call.
+        """
+        shell = self._open_shell()
+        shell.stdin.write(cmd + b"; echo " + self.END_MARKER + b"\n")
+        shell.stdin.flush()
+        
+        # Read the raw pipe under a deadline so a hung device can't stall the
+        # sampler thread (and with it stop_monitoring's join)
+        fd = shell.stdout.fileno()
+        deadline = time.monotonic() + self.SHELL_TIMEOUT
+        lines = []
+        pending = b""
+        with selectors.DefaultSelector() as sel:
+            sel.register(fd, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not sel.select(remaining):
+                    shell.kill()
+                    shell.wait()
+                    self.shell = None
+                    raise subprocess.TimeoutExpired(cmd, self.SHELL_TIMEOUT)
+                
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    # Shell exited mid-command; drop it so the next call reconnects
+                    self.close_shell()
+                    return b"".join(lines) + pending
+                
+                *complete, pending = (pending + chunk).split(b"\n")
+                for line in complete:
+                    if line.rstrip() == self.END_MARKER:
+                        return b"".join(lines)
+                    lines.append(line + b"\n")
+        
+    def close_shell(self):
+        """Terminate the persistent adb shell session"""
+        if self.shell is None:
+            return
+        try:
+            if self.shell.poll() is None:
+                self.shell.stdin.write(b"exit\n")
+                self.shell.stdin.flush()
+                self.shell.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.shell.kill()
+        finally:
+            self.shell = None
+            
+    def stop_monitoring(self):
+        """Stop background monitoring and release the adb shell"""
+        super().stop_monitoring()
+        self.close_shell()
+        
+    def _read_uevent(self) -> Optional[Dict[str, float]]:
+        """Read battery fields from the kernel power_supply uevent file"""
+        fields = {'voltage': 0.0, 'temperature': 0.0, 'current': 0.0, 'charging': False}
+        for match in _UEVENT_RE.finditer(self._run(self.UEVENT_CMD)):
+            name, convert = _UEVENT_FIELDS[match.group(1)]
+            fields[name] = convert(match.group(2))
+        return fields if 'level' in fields else None
+        
+    def _read_dumpsys(self) -> Dict[str, float]:
+        """Read battery fields via dumpsys battery and current_now (older devices)"""
+        # Battery stats and current draw in a single round-trip
+        stdout, _, current_out = self._run(self.DUMPSYS_CMD).partition(self.SEP_MARKER)
+        
+        fields = {'level': 0.0, 'voltage': 0.0, 'temperature': 0.0, 'charging': False}
+        for match in _BATTERY_RE.finditer(stdout):
+            name, convert = _BATTERY_FIELDS[match.group(1)]
+            fields[name] = convert(match.group(2))
+                
+        # Current draw in uA (missing or unreadable on some devices)
+        raw_current = current_out.strip()
+        fields['current'] = abs(int(raw_current)) / 1000 if raw_current.lstrip(b'-').isdigit() else 0.0
+        return fields
         
-    def get_battery_snapshot(self) -> Optional[BatterySnapshot]:
+    def read_sample(self) -> Optional[BatterySample]:
         """Get Android battery information"""
         try:
-            # Get battery stats
-            cmd = f"adb -s {self.device_id} shell dumpsys battery"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            
-            level = 0.0
-            voltage = 0.0
-            temperature = 0.0
-            charging = False
-            
-            for line in result.stdout.split('\n'):
-                if 'level:' in line:
-                    level = float(line.split(':')[1].strip())
-                elif 'voltage:' in line:
-                    voltage = float(line.split(':')[1].strip())
-                elif 'temperature:' in line:
-                    temperature = float(line.split(':')[1].strip()) / 10
-                elif 'status:' in line:
-                    charging = 'Charging' in line
-                    
-            # Get current draw (if available)
-            current_cmd = f"adb -s {self.device_id} shell cat /sys/class/power_supply/battery/current_now"
-            current_result = subprocess.run(current_cmd, shell=True, capture_output=True, text=True)
-            
-            try:
-                current = abs(float(current_result.stdout.strip())) / 1000  # Convert to mA
-            except:
-                current = 0.0
+            fields = self._read_uevent() if self.use_uevent else None
+            if fields is None:
+                # No readable uevent file; stop probing it on every sample
+                self.use_uevent = False
+                fields = self._read_dumpsys()
                 
+            voltage = fields['voltage']
+            current = fields['current']
+            
             # Calculate power
             power = (voltage * current) / 1000  # mW
             
-            return BatterySnapshot(
-                timestamp=datetime.now(),
-                level=level,
-                voltage=voltage,
-                temperature=temperature,
-                current=current,
-                power=power,
-                charging=charging
-            )
+            return (time.monotonic_ns(), fields['level'], voltage, fields['temperature'],
+                    current, power, fields['charging'])
             
         except Exception as e:
-            print(f"Error getting Android battery stats: {e}")
+            logger.warning("Error getting Android battery stats: %s", e)
             return None
 
 class IOSBatteryTracker(BatteryTracker):
@@ -172,56 +413,32 @@ class IOSBatteryTracker(BatteryTracker):
     def __init__(self, device_id: str):
         super().__init__(device_id, "ios")
         
-    def get_battery_snapshot(self) -> Optional[BatterySnapshot]:
+    def read_sample(self) -> Optional[BatterySample]:
         """Get iOS battery information"""
         try:
             # Use libimobiledevice if available
-            cmd = f"ideviceinfo -u {self.device_id} -q com.apple.mobile.battery"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            
-            level = 0.0
-            voltage = 0.0
-            temperature = 0.0
-            current = 0.0
-            charging = False
+            cmd = ["ideviceinfo", "-u", self.device_id, "-q", "com.apple.mobile.battery"]
+            result = subprocess.run(cmd, capture_output=True)
             
-            for line in result.stdout.split('\n'):
-                if 'BatteryCurrentCapacity' in line:
-                    level = float(line.split(':')[1].strip())
-                elif 'Voltage' in line:
-                    voltage = float(line.split(':')[1].strip())
-                elif 'Temperature' in line:
-                    temperature = float(line.split(':')[1].strip()) / 100
-                elif 'InstantAmperage' in line:
-                    current = abs(float(line.split(':')[1].strip()))
-                elif 'IsCharging' in line:
-                    charging = 'true' in line.lower()
+            fields = {'level': 0, 'voltage': 0.0, 'temperature': 0.0, 'current': 0, 'charging': False}
+            for match in _IOS_BATTERY_RE.finditer(result.stdout):
+                name, convert = _IOS_BATTERY_FIELDS[match.group(1)]
+                fields[name] = convert(match.group(2))
+            level = fields['level']
+            voltage = fields['voltage']
+            temperature = fields['temperature']
+            current = fields['current']
+            charging = fields['charging']
                     
             # Calculate power
             power = (voltage * current) / 1000  # mW
             
-            return BatterySnapshot(
-                timestamp=datetime.now(),
-                level=level,
-                voltage=voltage,
-                temperature=temperature,
-                current=current,
-                power=power,
-                charging=charging
-            )
+            return (time.monotonic_ns(), level, voltage, temperature, current, power, charging)
             
         except Exception as e:
             # Fallback to simulated data if tools not available
-            print(f"Note: Using simulated iOS battery data")
-            return BatterySnapshot(
-                timestamp=datetime.now(),
-                level=85.0 - (time.time() % 10) / 10,
-                voltage=3800.0,
-                temperature=32.0,
-                current=150.0,
-                power=570.0,
-                charging=False
-            )
+            logger.warning("Note: Using simulated iOS battery data")
+            return (time.monotonic_ns(), 85.0 - (time.time() % 10) / 10) + _SIMULATED_IOS_TAIL
 
 class BatteryTestSuite:
     """Comprehensive battery testing suite"""
@@ -231,6 +448,24 @@ class BatteryTestSuite:
             self.tracker = AndroidBatteryTracker(device_id)
         else:
             self.tracker = IOSBatteryTracker(device_id)
+        self._trigger_cmds: Dict[str, Tuple[List[str], Optional[bytes]]] = {}
+        self._figure = None  # Reused matplotlib Figure across report renders
+            
+    def _trigger(self, action: str):
+        """Send a test action to the app on the device"""
+        entry = self._trigger_cmds.get(action)
+        if entry is None:
+            if self.tracker.platform == "android":
+                cmd = ["adb", "-s", self.tracker.device_id, "shell",
+                       "am", "broadcast", "-a", _ANDROID_ACTIONS[action]]
+                entry = (cmd, None)
+            else:
+                # simctl reads the JSON payload from stdin when given "-"
+                cmd = ["xcrun", "simctl", "push", self.tracker.device_id, "com.bitcraps", "-"]
+                entry = (cmd, _IOS_PAYLOADS[action])
+            self._trigger_cmds[action] = entry
+        cmd, payload = entry
+        subprocess.run(cmd, input=payload)
             
     def run_baseline_test(self, duration: int = 60):
         """Measure baseline battery consumption"""
@@ -246,21 +481,11 @@ class BatteryTestSuite:
         self.tracker.start_phase("ble_scan")
         
         # Trigger BLE scanning on device
-        if self.tracker.platform == "android":
-            cmd = f"adb -s {self.tracker.device_id} shell am broadcast -a com.bitcraps.START_BLE_SCAN"
-        else:
-            cmd = f"xcrun simctl push {self.tracker.device_id} com.bitcraps '{json.dumps({\"action\": \"start_scan\"})}'"
-        
-        subprocess.run(cmd, shell=True)
+        self._trigger("start_scan")
         time.sleep(duration)
         
         # Stop scanning
-        if self.tracker.platform == "android":
-            cmd = f"adb -s {self.tracker.device_id} shell am broadcast -a com.bitcraps.STOP_BLE_SCAN"
-        else:
-            cmd = f"xcrun simctl push {self.tracker.device_id} com.bitcraps '{json.dumps({\"action\": \"stop_scan\"})}'"
-        
-        subprocess.run(cmd, shell=True)
+        self._trigger("stop_scan")
         self.tracker.end_phase()
         
     def run_ble_advertise_test(self, duration: int = 60):
@@ -269,21 +494,11 @@ class BatteryTestSuite:
         self.tracker.start_phase("ble_advertise")
         
         # Trigger BLE advertising
-        if self.tracker.platform == "android":
-            cmd = f"adb -s {self.tracker.device_id} shell am broadcast -a com.bitcraps.START_BLE_ADVERTISE"
-        else:
-            cmd = f"xcrun simctl push {self.tracker.device_id} com.bitcraps '{json.dumps({\"action\": \"start_advertise\"})}'"
-        
-        subprocess.run(cmd, shell=True)
+        self._trigger("start_advertise")
         time.sleep(duration)
         
         # Stop advertising
-        if self.tracker.platform == "android":
-            cmd = f"adb -s {self.tracker.device_id} shell am broadcast -a com.bitcraps.STOP_BLE_ADVERTISE"
-        else:
-            cmd = f"xcrun simctl push {self.tracker.device_id} com.bitcraps '{json.dumps({\"action\": \"stop_advertise\"})}'"
-        
-        subprocess.run(cmd, shell=True)
+        self._trigger("stop_advertise")
         self.tracker.end_phase()
         
     def run_active_connection_test(self, duration: int = 60):
@@ -292,25 +507,15 @@ class BatteryTestSuite:
         self.tracker.start_phase("active_connection")
         
         # Simulate active data transfer
-        if self.tracker.platform == "android":
-            cmd = f"adb -s {self.tracker.device_id} shell am broadcast -a com.bitcraps.START_DATA_TRANSFER"
-        else:
-            cmd = f"xcrun simctl push {self.tracker.device_id} com.bitcraps '{json.dumps({\"action\": \"start_transfer\"})}'"
-        
-        subprocess.run(cmd, shell=True)
+        self._trigger("start_transfer")
         time.sleep(duration)
         
         # Stop transfer
-        if self.tracker.platform == "android":
-            cmd = f"adb -s {self.tracker.device_id} shell am broadcast -a com.bitcraps.STOP_DATA_TRANSFER"
-        else:
-            cmd = f"xcrun simctl push {self.tracker.device_id} com.bitcraps '{json.dumps({\"action\": \"stop_transfer\"})}'"
-        
-        subprocess.run(cmd, shell=True)
+        self._trigger("stop_transfer")
         self.tracker.end_phase()
         
-    def run_complete_test(self):
-        """Run complete battery test suite"""
+    def run_complete_test(self, phase_duration: int = 60) -> Dict[str, np.ndarray]:
+        """Run complete battery test suite and return the per-phase aggregates"""
         print("\n" + "="*60)
         print("BATTERY USAGE TEST SUITE")
         print("="*60)
@@ -320,60 +525,93 @@ class BatteryTestSuite:
         self.tracker.start_monitoring()
         
         # Run all test phases
-        self.run_baseline_test(60)
+        self.run_baseline_test(phase_duration)
         time.sleep(10)  # Rest between tests
         
-        self.run_ble_scan_test(60)
+        self.run_ble_scan_test(phase_duration)
         time.sleep(10)
         
-        self.run_ble_advertise_test(60)
+        self.run_ble_advertise_test(phase_duration)
         time.sleep(10)
         
-        self.run_active_connection_test(60)
+        self.run_active_connection_test(phase_duration)
         
         self.tracker.stop_monitoring()
         
         # Generate report
-        self.generate_report()
+        return self.generate_report()
+        
+    def _aggregate(self) -> Dict[str, np.ndarray]:
+        """Compute per-phase summary arrays shared by the report, plot and export"""
+        phases = self.tracker.phases
+        durations_s = np.array([p.duration.total_seconds() for p in phases], dtype=np.float64)
+        stats = np.array([_phase_stats(p.level, p.power, p.n) for p in phases],
+                         dtype=np.float64).reshape(-1, 3)
+        drain, avg_power, peak_power = stats.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drain_rate = np.where(durations_s > 0, drain / (durations_s / 60), 0.0)
+        return {
+            "names": [p.name for p in phases],
+            "durations_s": durations_s,
+            "avg_power": avg_power,
+            "peak_power": peak_power,
+            "drain": drain,
+            "drain_rate": drain_rate,
+        }
         
-    def generate_report(self):
-        """Generate battery usage report"""
+    def generate_report(self) -> Dict[str, np.ndarray]:
+        """Generate battery usage report and return the aggregates it used"""
         print("\n" + "="*60)
         print("BATTERY USAGE REPORT")
         print("="*60)
         
-        baseline = next((p for p in self.tracker.phases if p.name == "baseline"), None)
-        
-        for phase in self.tracker.phases:
-            print(f"\n{phase.name.upper()}:")
-            print(f"  Duration: {phase.duration.total_seconds():.1f}s")
-            print(f"  Battery drain: {phase.battery_drain:.2f}%")
-            print(f"  Drain rate: {phase.battery_drain / (phase.duration.total_seconds() / 60):.3f}%/min")
-            print(f"  Average power: {phase.average_power:.2f} mW")
+        agg = self._aggregate()
+        names = agg["names"]
+        baseline = names.index("baseline") if "baseline" in names else None
+        
+        if baseline is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                power_increase = (agg["avg_power"] / agg["avg_power"][baseline] - 1) * 100
+                drain_increase = (agg["drain"] / agg["drain"][baseline] - 1) * 100
+        
+        for i, name in enumerate(names):
+            print(f"\n{name.upper()}:")
+            print(f"  Duration: {agg['durations_s'][i]:.1f}s")
+            print(f"  Battery drain: {agg['drain'][i]:.2f}%")
+            print(f"  Drain rate: {agg['drain_rate'][i]:.3f}%/min")
+            print(f"  Average power: {agg['avg_power'][i]:.2f} mW")
+            print(f"  Peak power: {agg['peak_power'][i]:.2f} mW")
             
-            if baseline and phase != baseline:
-                power_increase = ((phase.average_power - baseline.average_power) / baseline.average_power) * 100
-                drain_increase = ((phase.battery_drain - baseline.battery_drain) / baseline.battery_drain) * 100
-                print(f"  Power increase vs baseline: {power_increase:.1f}%")
-                print(f"  Drain increase vs baseline: {drain_increase:.1f}%")
+            if baseline is not None and i != baseline:
+                print(f"  Power increase vs baseline: {power_increase[i]:.1f}%")
+                print(f"  Drain increase vs baseline: {drain_increase[i]:.1f}%")
                 
         # Generate graph
-        self.plot_battery_usage()
+        self.plot_battery_usage(agg)
+        return agg
         
-    def plot_battery_usage(self):
+    def plot_battery_usage(self, agg: Optional[Dict[str, np.ndarray]] = None):
         """Create battery usage visualization"""
+        if agg is None:
+            agg = self._aggregate()
+            
         try:
-            import matplotlib.pyplot as plt
+            from matplotlib.figure import Figure
             
-            fig, axes = plt.subplots(2, 2, figsize=(12, 8))
+            # Figure is used without pyplot, so no GUI backend or global state is involved
+            if self._figure is None:
+                self._figure = Figure(figsize=(12, 8))
+            fig = self._figure
+            fig.clear()
+            axes = fig.subplots(2, 2)
             fig.suptitle(f'Battery Usage Analysis - {self.tracker.platform.upper()} Device', fontsize=16)
             
             # Plot 1: Battery level over time
             ax1 = axes[0, 0]
             for phase in self.tracker.phases:
-                if phase.snapshots:
-                    times = [(s.timestamp - phase.start_time).total_seconds() for s in phase.snapshots]
-                    levels = [s.level for s in phase.snapshots]
+                if phase.n:
+                    times = phase.elapsed_s
+                    levels = phase.level[:phase.n]
                     ax1.plot(times, levels, label=phase.name)
             ax1.set_xlabel('Time (seconds)')
             ax1.set_ylabel('Battery Level (%)')
@@ -383,18 +621,16 @@ class BatteryTestSuite:
             
             # Plot 2: Power consumption by phase
             ax2 = axes[0, 1]
-            phase_names = [p.name for p in self.tracker.phases]
-            avg_powers = [p.average_power for p in self.tracker.phases]
+            phase_names = agg["names"]
             colors = ['green', 'yellow', 'orange', 'red']
-            ax2.bar(phase_names, avg_powers, color=colors[:len(phase_names)])
+            ax2.bar(phase_names, agg["avg_power"], color=colors[:len(phase_names)])
             ax2.set_ylabel('Average Power (mW)')
             ax2.set_title('Power Consumption by Phase')
             ax2.grid(True, axis='y')
             
             # Plot 3: Drain rate comparison
             ax3 = axes[1, 0]
-            drain_rates = [p.battery_drain / (p.duration.total_seconds() / 60) for p in self.tracker.phases]
-            ax3.bar(phase_names, drain_rates, color=colors[:len(phase_names)])
+            ax3.bar(phase_names, agg["drain_rate"], color=colors[:len(phase_names)])
             ax3.set_ylabel('Drain Rate (%/min)')
             ax3.set_title('Battery Drain Rate by Phase')
             ax3.grid(True, axis='y')
@@ -402,9 +638,9 @@ class BatteryTestSuite:
             # Plot 4: Temperature over time
             ax4 = axes[1, 1]
             for phase in self.tracker.phases:
-                if phase.snapshots:
-                    times = [(s.timestamp - phase.start_time).total_seconds() for s in phase.snapshots]
-                    temps = [s.temperature for s in phase.snapshots]
+                if phase.n:
+                    times = phase.elapsed_s
+                    temps = phase.temperature[:phase.n]
                     ax4.plot(times, temps, label=phase.name)
             ax4.set_xlabel('Time (seconds)')
             ax4.set_ylabel('Temperature (°C)')
@@ -412,49 +648,66 @@ class BatteryTestSuite:
             ax4.legend()
             ax4.grid(True)
             
-            plt.tight_layout()
+            fig.tight_layout()
             
             # Save figure
             filename = f"battery_report_{self.tracker.platform}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            plt.savefig(filename, dpi=100)
+            fig.savefig(filename, dpi=100)
             print(f"\nBattery usage graph saved to: {filename}")
             
         except ImportError:
             print("\nNote: matplotlib not available for plotting")
             
-    def save_data(self, filename: str):
-        """Save raw battery data to JSON"""
-        data = {
-            "device_id": self.tracker.device_id,
-            "platform": self.tracker.platform,
-            "phases": []
-        }
-        
-        for phase in self.tracker.phases:
-            phase_data = {
-                "name": phase.name,
-                "start_time": phase.start_time.isoformat(),
-                "end_time": phase.end_time.isoformat() if phase.end_time else None,
-                "duration_seconds": phase.duration.total_seconds(),
-                "battery_drain": phase.battery_drain,
-                "average_power": phase.average_power,
-                "snapshots": [
-                    {
-                        "timestamp": s.timestamp.isoformat(),
-                        "level": s.level,
-                        "voltage": s.voltage,
-                        "temperature": s.temperature,
-                        "current": s.current,
-                        "power": s.power,
-                        "charging": s.charging
-                    }
-                    for s in phase.snapshots
-                ]
-            }
-            data["phases"].append(phase_data)
+    def save_data(self, filename: str, agg: Optional[Dict[str, np.ndarray]] = None,
+                  chunk_size: int = 1000):
+        """Stream raw battery data to JSON, writing snapshots in chunks"""
+        if agg is None:
+            agg = self._aggregate()
+            
+        with open(filename, 'wb') as f:
+            f.write(b'{"device_id": ' + _json_bytes(self.tracker.device_id)
+                    + b', "platform": ' + _json_bytes(self.tracker.platform)
+                    + b', "phases": [')
             
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+            for i, phase in enumerate(self.tracker.phases):
+                if i:
+                    f.write(b', ')
+                header = {
+                    "name": phase.name,
+                    "start_time": phase.start_time.isoformat(),
+                    "end_time": phase.end_time.isoformat() if phase.end_time else None,
+                    "duration_seconds": float(agg["durations_s"][i]),
+                    "battery_drain": float(agg["drain"][i]),
+                    "average_power": float(agg["avg_power"][i]),
+                }
+                # Reopen the header object to append the snapshot array
+                f.write(_json_bytes(header)[:-1] + b', "snapshots": [')
+                
+                for start in range(0, phase.n, chunk_size):
+                    end = min(start + chunk_size, phase.n)
+                    rows = [
+                        {
+                            "timestamp": phase.wall_time(ts).isoformat(),
+                            "level": level,
+                            "voltage": voltage,
+                            "temperature": temperature,
+                            "current": current,
+                            "power": power,
+                            "charging": charging
+                        }
+                        for ts, level, voltage, temperature, current, power, charging in zip(
+                            phase.timestamp_ns[start:end].tolist(), phase.level[start:end].tolist(),
+                            phase.voltage[start:end].tolist(), phase.temperature[start:end].tolist(),
+                            phase.current[start:end].tolist(), phase.power[start:end].tolist(),
+                            phase.charging[start:end].tolist()
+                        )
+                    ]
+                    if start:
+                        f.write(b', ')
+                    f.write(_json_bytes(rows)[1:-1])
+                    
+                f.write(b']}')
+            f.write(b']}\n')
         print(f"Battery data saved to: {filename}")
 
 def main():
@@ -470,6 +723,8 @@ def main():
     
     args = parser.parse_args()
     
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    
     # Create test suite
     test_suite = BatteryTestSuite(args.device, args.platform)
     
@@ -478,19 +733,13 @@ def main():
         test_duration = 30
     else:
         test_duration = args.duration
-        
-    # Modify test methods to use custom duration
-    test_suite.run_baseline_test = lambda: test_suite.run_baseline_test(test_duration)
-    test_suite.run_ble_scan_test = lambda: test_suite.run_ble_scan_test(test_duration)
-    test_suite.run_ble_advertise_test = lambda: test_suite.run_ble_advertise_test(test_duration)
-    test_suite.run_active_connection_test = lambda: test_suite.run_active_connection_test(test_duration)
     
     # Run complete test
-    test_suite.run_complete_test()
+    agg = test_suite.run_complete_test(phase_duration=test_duration)
     
-    # Save data if requested
+    # Save data if requested, reusing the report's aggregates
     if args.output:
-        test_suite.save_data(args.output)
+        test_suite.save_data(args.output, agg)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,19 +5,73 @@ Orchestrates BLE testing across multiple physical devices
 """
 
 import os
+import re
+import selectors
 import sys
 import json
+import asyncio
 import time
 import subprocess
 import threading
-import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Upper bound in seconds for one-shot discovery commands
+_DISCOVERY_TIMEOUT = 30
+
+# Sentinel echoed after each command sent to a persistent adb shell
+_SHELL_END = b"__BITCRAPS_END__"
+
+# Default upper bound in seconds for one command on a persistent adb shell
+_SHELL_TIMEOUT = 30
+
+# Matches the "[key]: [value]" lines printed by a bare `getprop`
+_GETPROP_RE = re.compile(rb'^\[([^\]]+)\]: \[([^\]]*)\]', re.M)
+
+# Matches the battery percentage line of `dumpsys battery`
+_BATTERY_LEVEL_RE = re.compile(rb'^\s*level:\s*(\d+)', re.M)
+
+# ANSI color used when logging each result status
+_STATUS_COLOR = {
+    "PASS": "\033[92m",
+    "FAIL": "\033[91m",
+    "WARNING": "\033[93m",
+    "SKIP": "\033[94m"
+}
+
+# Write buffer for the report files
+_REPORT_BUFFER = 1 << 20
+
+# One result row of the HTML report
+_HTML_ROW = """
+        <tr>
+            <td>{test_name}</td>
+            <td>{device_id}</td>
+            <td class="{status_class}">{status}</td>
+            <td>{duration_seconds:.1f}s</td>
+            <td>{message}</td>
+        </tr>
+"""
+
+# Closing markup of the HTML report
+_HTML_FOOTER = """
+    </table>
+</body>
+</html>
+"""
+
 # Test configuration
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TestConfig:
     """Test configuration parameters"""
     test_duration_minutes: int = 30
@@ -27,7 +81,7 @@ class TestConfig:
     connection_timeout_seconds: int = 30
     log_level: str = "DEBUG"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DeviceInfo:
     """Device information"""
     device_id: str
@@ -37,7 +91,7 @@ class DeviceInfo:
     api_level: Optional[int] = None
     bluetooth_version: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TestResult:
     """Test result for a single test case"""
     test_name: str
@@ -47,6 +101,15 @@ class TestResult:
     message: str
     metrics: Dict[str, Any]
 
+# Field names resolved once so report rows are built without asdict's recursive deep copy
+_CONFIG_FIELDS = tuple(f.name for f in fields(TestConfig))
+_DEVICE_FIELDS = tuple(f.name for f in fields(DeviceInfo))
+_RESULT_FIELDS = tuple(f.name for f in fields(TestResult))
+
+def _as_dict(obj: Any, names: tuple) -> Dict[str, Any]:
+    """Shallow dict of a flat dataclass instance"""
+    return {name: getattr(obj, name) for name in names}
+
 class DeviceTestRunner:
     """Main test runner for physical devices"""
     
@@ -54,13 +117,90 @@ class DeviceTestRunner:
         self.config = config
         self.devices: List[DeviceInfo] = []
         self.results: List[TestResult] = []
-        self.test_run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        started = datetime.now()
+        self.test_run_id = started.strftime("%Y%m%d_%H%M%S")
+        self._start_iso = started.isoformat()
         self.output_dir = Path(f"test-results/physical-devices/{self.test_run_id}")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._device_info_cache: Dict[str, DeviceInfo] = {}
+        self._shells: Dict[str, subprocess.Popen] = {}
+        self._shell_locks: Dict[str, threading.Lock] = {}
+        self._shells_lock = threading.Lock()
+    
+    def __enter__(self) -> "DeviceTestRunner":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Terminate all persistent adb shell sessions"""
+        with self._shells_lock:
+            shells, self._shells = self._shells, {}
+        for shell in shells.values():
+            try:
+                if shell.poll() is None:
+                    shell.stdin.write(b"exit\n")
+                    shell.stdin.flush()
+                    shell.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                shell.kill()
+    
+    def _adb_shell(self, device_id: str, cmd: str, timeout: float = _SHELL_TIMEOUT) -> bytes:
+        """Run a command on a device through its long-lived adb shell session
+        
+        Raises subprocess.TimeoutExpired if the command's output isn't complete
+        within timeout seconds; the session is killed and restarted next call.
+        """
+        with self._shells_lock:
+            lock = self._shell_locks.setdefault(device_id, threading.Lock())
+        
+        with lock:
+            shell = self._shells.get(device_id)
+            if shell is None or shell.poll() is not None:
+                shell = subprocess.Popen(
+                    ["adb", "-s", device_id, "shell"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+                self._shells[device_id] = shell
+            
+            shell.stdin.write(cmd.encode() + b"; echo " + _SHELL_END + b"\n")
+            shell.stdin.flush()
+            
+            # Read the raw pipe under a deadline so a stalled device can't
+            # hold this device's lock forever
+            fd = shell.stdout.fileno()
+            deadline = time.monotonic() + timeout
+            lines = []
+            pending = b""
+            with selectors.DefaultSelector() as sel:
+                sel.register(fd, selectors.EVENT_READ)
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not sel.select(remaining):
+                        shell.kill()
+                        shell.wait()
+                        self._shells.pop(device_id, None)
+                        raise subprocess.TimeoutExpired(cmd, timeout)
+                    
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        # Shell exited mid-command; the next call starts a new one
+                        self._shells.pop(device_id, None)
+                        return b"".join(lines) + pending
+                    
+                    *complete, pending = (pending + chunk).split(b"\n")
+                    for line in complete:
+                        if line.rstrip() == _SHELL_END:
+                            return b"".join(lines)
+                        lines.append(line + b"\n")
     
     def discover_devices(self) -> None:
         """Discover all connected devices"""
         print("Discovering connected devices...")
+        self.devices = []
         
         # Discover Android devices
         self._discover_android_devices()
@@ -76,38 +216,47 @@ class DeviceTestRunner:
     def _discover_android_devices(self) -> None:
         """Discover Android devices via ADB"""
         try:
-            result = subprocess.run(["adb", "devices"], capture_output=True, text=True)
+            result = subprocess.run(
+                ["adb", "devices"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, timeout=_DISCOVERY_TIMEOUT, check=False
+            )
             lines = result.stdout.strip().split("\n")[1:]  # Skip header
+            device_ids = [line.split("\t")[0] for line in lines if "\tdevice" in line]
             
-            for line in lines:
-                if "\tdevice" in line:
-                    device_id = line.split("\t")[0]
-                    device_info = self._get_android_device_info(device_id)
-                    if device_info:
-                        self.devices.append(device_info)
+            # Forget devices that have disconnected since the last discovery
+            for stale in self._device_info_cache.keys() - set(device_ids):
+                del self._device_info_cache[stale]
+            
+            # Property queries are independent adb round-trips, so issue them concurrently
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                infos = executor.map(self._get_android_device_info, device_ids)
+                self.devices.extend(info for info in infos if info)
         except FileNotFoundError:
             print("Warning: adb not found, skipping Android devices")
+        except subprocess.TimeoutExpired:
+            print("Warning: adb devices timed out, skipping Android devices")
     
     def _get_android_device_info(self, device_id: str) -> Optional[DeviceInfo]:
         """Get detailed Android device information"""
+        cached = self._device_info_cache.get(device_id)
+        if cached:
+            return cached
+        
         try:
-            def adb_shell(cmd: str) -> str:
-                result = subprocess.run(
-                    ["adb", "-s", device_id, "shell", cmd],
-                    capture_output=True, text=True
-                )
-                return result.stdout.strip()
+            # Dump every property in one round-trip and pick out what we need
+            props = dict(_GETPROP_RE.findall(self._adb_shell(device_id, "getprop")))
             
-            model = adb_shell("getprop ro.product.model")
-            version = adb_shell("getprop ro.build.version.release")
-            api = int(adb_shell("getprop ro.build.version.sdk"))
+            model = props.get(b"ro.product.model", b"").decode()
+            version = props.get(b"ro.build.version.release", b"").decode()
+            api = int(props[b"ro.build.version.sdk"])
             
             # Check Bluetooth version
-            bt_version = adb_shell("getprop ro.bluetooth.version")
+            bt_version = props.get(b"ro.bluetooth.version", b"").decode()
             if not bt_version:
                 bt_version = "4.0+"  # Assume minimum BLE support
             
-            return DeviceInfo(
+            info = DeviceInfo(
                 device_id=device_id,
                 platform="android",
                 model=model,
@@ -115,6 +264,8 @@ class DeviceTestRunner:
                 api_level=api,
                 bluetooth_version=bt_version
             )
+            self._device_info_cache[device_id] = info
+            return info
         except Exception as e:
             print(f"Error getting Android device info for {device_id}: {e}")
             return None
@@ -122,7 +273,11 @@ class DeviceTestRunner:
     def _discover_ios_devices(self) -> None:
         """Discover iOS devices via ios-deploy"""
         try:
-            result = subprocess.run(["ios-deploy", "-c"], capture_output=True, text=True)
+            result = subprocess.run(
+                ["ios-deploy", "-c"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, timeout=_DISCOVERY_TIMEOUT, check=False
+            )
             lines = result.stdout.strip().split("\n")
             
             for line in lines:
@@ -136,6 +291,8 @@ class DeviceTestRunner:
                             self.devices.append(device_info)
         except FileNotFoundError:
             print("Warning: ios-deploy not found, skipping iOS devices")
+        except subprocess.TimeoutExpired:
+            print("Warning: ios-deploy timed out, skipping iOS devices")
     
     def _get_ios_device_info(self, device_id: str) -> Optional[DeviceInfo]:
         """Get detailed iOS device information"""
@@ -165,13 +322,28 @@ class DeviceTestRunner:
             self.test_thermal_performance,
             self.test_network_resilience,
         ]
+        scenario_names = [scenario.__name__ for scenario in test_scenarios]
         
-        for scenario in test_scenarios:
-            print(f"\nRunning {scenario.__name__}...")
-            for device in self.devices:
-                result = scenario(device)
-                self.results.append(result)
-                self._log_result(result)
+        # Scenarios are ADB/sleep bound, so every device runs the current
+        # scenario concurrently; results are logged from this thread in order
+        with ThreadPoolExecutor(max_workers=max(1, len(self.devices))) as executor:
+            for name, scenario in zip(scenario_names, test_scenarios):
+                print(f"\nRunning {name}...")
+                if asyncio.iscoroutinefunction(scenario):
+                    results = asyncio.run(self._gather_scenario(scenario))
+                else:
+                    results = executor.map(scenario, self.devices)
+                for result in results:
+                    self.results.append(result)
+                    self._log_result(result)
+    
+    async def _gather_scenario(self, scenario) -> List[TestResult]:
+        """Run an async scenario on all devices on one event loop"""
+        return await asyncio.gather(*(scenario(device) for device in self.devices))
+    
+    async def _adb(self, device_id: str, cmd: str) -> bytes:
+        """Run a device shell command without blocking the event loop"""
+        return await asyncio.to_thread(self._adb_shell, device_id, cmd)
     
     def test_ble_discovery(self, device: DeviceInfo) -> TestResult:
         """Test BLE discovery capabilities"""
@@ -179,21 +351,14 @@ class DeviceTestRunner:
         
         try:
             if device.platform == "android":
-                # Start BLE scan
-                subprocess.run([
-                    "adb", "-s", device.device_id,
-                    "shell", "am", "broadcast",
-                    "-a", "com.bitcraps.TEST_BLE_SCAN_START"
-                ])
-                
-                time.sleep(self.config.ble_scan_duration_seconds)
-                
-                # Get scan results
-                result = subprocess.run([
-                    "adb", "-s", device.device_id,
-                    "shell", "am", "broadcast",
-                    "-a", "com.bitcraps.TEST_BLE_SCAN_RESULTS"
-                ], capture_output=True, text=True)
+                # Start the scan, wait on the device and collect results in one round-trip
+                output = self._adb_shell(
+                    device.device_id,
+                    "am broadcast -a com.bitcraps.TEST_BLE_SCAN_START"
+                    f" && sleep {self.config.ble_scan_duration_seconds}"
+                    " && am broadcast -a com.bitcraps.TEST_BLE_SCAN_RESULTS",
+                    timeout=self.config.ble_scan_duration_seconds + _SHELL_TIMEOUT
+                )
                 
                 # Parse results (would need actual parsing logic)
                 peers_found = 3  # Placeholder
@@ -255,26 +420,28 @@ class DeviceTestRunner:
             metrics={"games_played": 5, "avg_latency_ms": 50}
         )
     
-    def test_background_operation(self, device: DeviceInfo) -> TestResult:
+    async def test_background_operation(self, device: DeviceInfo) -> TestResult:
         """Test background BLE operations"""
         start_time = time.time()
         
-        if device.platform == "android":
-            # Put app in background
-            subprocess.run([
-                "adb", "-s", device.device_id,
-                "shell", "input", "keyevent", "HOME"
-            ])
-            
-            time.sleep(5)
-            
-            # Check if BLE still works
-            # (would need actual verification)
-            status = "PASS"
-            message = "Background BLE operations functional"
-        else:
-            status = "WARNING"
-            message = "iOS background BLE has limitations"
+        try:
+            if device.platform == "android":
+                # Put app in background
+                await self._adb(device.device_id, "input keyevent HOME")
+                
+                await asyncio.sleep(5)
+                
+                # Check if BLE still works
+                # (would need actual verification)
+                status = "PASS"
+                message = "Background BLE operations functional"
+            else:
+                status = "WARNING"
+                message = "iOS background BLE has limitations"
+        
+        except Exception as e:
+            status = "FAIL"
+            message = str(e)
         
         return TestResult(
             test_name="background_operation",
@@ -285,50 +452,45 @@ class DeviceTestRunner:
             metrics={}
         )
     
-    def test_battery_performance(self, device: DeviceInfo) -> TestResult:
+    async def test_battery_performance(self, device: DeviceInfo) -> TestResult:
         """Test battery consumption"""
         start_time = time.time()
         
-        if device.platform == "android":
-            # Reset battery stats
-            subprocess.run([
-                "adb", "-s", device.device_id,
-                "shell", "dumpsys", "batterystats", "--reset"
-            ])
-            
-            # Get initial battery
-            result = subprocess.run([
-                "adb", "-s", device.device_id,
-                "shell", "dumpsys", "battery"
-            ], capture_output=True, text=True)
-            
-            initial_battery = self._parse_battery_level(result.stdout)
-            
-            # Wait for test duration (shortened for demo)
-            test_duration = min(60, self.config.test_duration_minutes * 60)
-            time.sleep(test_duration)
-            
-            # Get final battery
-            result = subprocess.run([
-                "adb", "-s", device.device_id,
-                "shell", "dumpsys", "battery"
-            ], capture_output=True, text=True)
-            
-            final_battery = self._parse_battery_level(result.stdout)
-            
-            drain = initial_battery - final_battery
-            drain_per_hour = (drain / test_duration) * 3600
-            
-            status = "PASS" if drain_per_hour <= self.config.battery_threshold_percent else "FAIL"
-            message = f"Battery drain: {drain_per_hour:.1f}%/hour"
-            metrics = {
-                "initial_battery": initial_battery,
-                "final_battery": final_battery,
-                "drain_percent_per_hour": drain_per_hour
-            }
-        else:
-            status = "SKIP"
-            message = "iOS battery testing not implemented"
+        try:
+            if device.platform == "android":
+                # Reset battery stats
+                await self._adb(device.device_id, "dumpsys batterystats --reset")
+                
+                # Get initial battery
+                output = await self._adb(device.device_id, "dumpsys battery")
+                initial_battery = self._parse_battery_level(output)
+                
+                # Wait for test duration (shortened for demo)
+                test_duration = min(60, self.config.test_duration_minutes * 60)
+                await asyncio.sleep(test_duration)
+                
+                # Get final battery
+                output = await self._adb(device.device_id, "dumpsys battery")
+                final_battery = self._parse_battery_level(output)
+                
+                drain = initial_battery - final_battery
+                drain_per_hour = (drain / test_duration) * 3600
+                
+                status = "PASS" if drain_per_hour <= self.config.battery_threshold_percent else "FAIL"
+                message = f"Battery drain: {drain_per_hour:.1f}%/hour"
+                metrics = {
+                    "initial_battery": initial_battery,
+                    "final_battery": final_battery,
+                    "drain_percent_per_hour": drain_per_hour
+                }
+            else:
+                status = "SKIP"
+                message = "iOS battery testing not implemented"
+                metrics = {}
+        
+        except Exception as e:
+            status = "FAIL"
+            message = str(e)
             metrics = {}
         
         return TestResult(
@@ -340,27 +502,30 @@ class DeviceTestRunner:
             metrics=metrics
         )
     
-    def test_thermal_performance(self, device: DeviceInfo) -> TestResult:
+    async def test_thermal_performance(self, device: DeviceInfo) -> TestResult:
         """Test thermal performance and throttling"""
         start_time = time.time()
         
-        if device.platform == "android":
-            # Get thermal status
-            result = subprocess.run([
-                "adb", "-s", device.device_id,
-                "shell", "dumpsys", "thermalservice"
-            ], capture_output=True, text=True)
-            
-            # Parse thermal status (would need actual parsing)
-            thermal_status = "normal"
-            temperature = 35.0  # Celsius
-            
-            status = "PASS" if thermal_status == "normal" else "WARNING"
-            message = f"Thermal status: {thermal_status}, Temperature: {temperature}°C"
-            metrics = {"thermal_status": thermal_status, "temperature_celsius": temperature}
-        else:
-            status = "SKIP"
-            message = "iOS thermal testing not implemented"
+        try:
+            if device.platform == "android":
+                # Get thermal status
+                output = await self._adb(device.device_id, "dumpsys thermalservice")
+                
+                # Parse thermal status (would need actual parsing)
+                thermal_status = "normal"
+                temperature = 35.0  # Celsius
+                
+                status = "PASS" if thermal_status == "normal" else "WARNING"
+                message = f"Thermal status: {thermal_status}, Temperature: {temperature}°C"
+                metrics = {"thermal_status": thermal_status, "temperature_celsius": temperature}
+            else:
+                status = "SKIP"
+                message = "iOS thermal testing not implemented"
+                metrics = {}
+        
+        except Exception as e:
+            status = "FAIL"
+            message = str(e)
             metrics = {}
         
         return TestResult(
@@ -388,21 +553,14 @@ class DeviceTestRunner:
             metrics={"recovery_time_seconds": 3.5}
         )
     
-    def _parse_battery_level(self, dumpsys_output: str) -> int:
+    def _parse_battery_level(self, dumpsys_output: bytes) -> int:
         """Parse battery level from dumpsys output"""
-        for line in dumpsys_output.split("\n"):
-            if "level:" in line:
-                return int(line.split(":")[1].strip())
-        return 100
+        match = _BATTERY_LEVEL_RE.search(dumpsys_output)
+        return int(match.group(1)) if match else 100
     
     def _log_result(self, result: TestResult) -> None:
         """Log test result"""
-        status_color = {
-            "PASS": "\033[92m",
-            "FAIL": "\033[91m",
-            "WARNING": "\033[93m",
-            "SKIP": "\033[94m"
-        }.get(result.status, "")
+        status_color = _STATUS_COLOR.get(result.status, "")
         
         print(f"  {status_color}{result.status}\033[0m - {result.device_id}: {result.message}")
     
@@ -413,29 +571,40 @@ class DeviceTestRunner:
         # Create JSON report
         report_data = {
             "test_run_id": self.test_run_id,
-            "timestamp": datetime.now().isoformat(),
-            "config": asdict(self.config),
-            "devices": [asdict(d) for d in self.devices],
-            "results": [asdict(r) for r in self.results],
+            "timestamp": self._start_iso,
+            "config": _as_dict(self.config, _CONFIG_FIELDS),
+            "devices": [_as_dict(d, _DEVICE_FIELDS) for d in self.devices],
+            "results": [_as_dict(r, _RESULT_FIELDS) for r in self.results],
             "summary": self._generate_summary()
         }
         
         report_path = self.output_dir / "report.json"
-        with open(report_path, "w") as f:
-            json.dump(report_data, f, indent=2)
+        html_path = self.output_dir / "report.html"
         
-        # Generate HTML report
-        self._generate_html_report(report_data)
+        # Both artifacts go out through one pair of large buffers; the
+        # output directory already exists from __init__
+        with ExitStack() as stack:
+            json_file = stack.enter_context(open(report_path, "wb", buffering=_REPORT_BUFFER))
+            html_file = stack.enter_context(open(html_path, "w", buffering=_REPORT_BUFFER))
+            
+            if orjson is not None:
+                json_file.write(orjson.dumps(report_data, option=orjson.OPT_INDENT_2))
+            else:
+                json_file.write(json.dumps(report_data, indent=2).encode())
+            
+            # Generate HTML report
+            self._generate_html_report(report_data, html_file)
         
         print(f"Report generated: {report_path}")
     
     def _generate_summary(self) -> Dict[str, Any]:
         """Generate test summary"""
         total = len(self.results)
-        passed = sum(1 for r in self.results if r.status == "PASS")
-        failed = sum(1 for r in self.results if r.status == "FAIL")
-        warnings = sum(1 for r in self.results if r.status == "WARNING")
-        skipped = sum(1 for r in self.results if r.status == "SKIP")
+        counts = Counter(r.status for r in self.results)
+        passed = counts["PASS"]
+        failed = counts["FAIL"]
+        warnings = counts["WARNING"]
+        skipped = counts["SKIP"]
         
         return {
             "total_tests": total,
@@ -446,13 +615,13 @@ class DeviceTestRunner:
             "pass_rate": (passed / total * 100) if total > 0 else 0
         }
     
-    def _generate_html_report(self, report_data: Dict[str, Any]) -> None:
-        """Generate HTML report"""
-        html_path = self.output_dir / "report.html"
-        
+    def _generate_html_report(self, report_data: Dict[str, Any], f) -> None:
+        """Write the HTML report to an open text file"""
+        from html import escape
+
         summary = report_data["summary"]
         
-        html_content = f"""
+        html_header = f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -497,29 +666,29 @@ class DeviceTestRunner:
         </tr>
 """
         
-        for result in report_data["results"]:
-            status_class = result['status'].lower()
-            html_content += f"""
-        <tr>
-            <td>{result['test_name']}</td>
-            <td>{result['device_id']}</td>
-            <td class="{status_class}">{result['status']}</td>
-            <td>{result['duration_seconds']:.1f}s</td>
-            <td>{result['message']}</td>
-        </tr>
-"""
-        
-        html_content += """
-    </table>
-</body>
-</html>
-"""
+        # Escape device-supplied strings once up front; status and duration are ours
+        rows = [
+            {
+                "test_name": escape(r["test_name"]),
+                "device_id": escape(r["device_id"]),
+                "status": r["status"],
+                "status_class": r["status"].lower(),
+                "duration_seconds": r["duration_seconds"],
+                "message": escape(r["message"]),
+            }
+            for r in report_data["results"]
+        ]
         
-        with open(html_path, "w") as f:
-            f.write(html_content)
+        # Stream rows straight to the file rather than growing one string
+        f.write(html_header)
+        for row in rows:
+            f.write(_HTML_ROW.format_map(row))
+        f.write(_HTML_FOOTER)
 
 def main():
     """Main entry point"""
+    import argparse
+
     parser = argparse.ArgumentParser(description="BitCraps Physical Device Test Runner")
     parser.add_argument("--duration", type=int, default=30,
                         help="Test duration in minutes")
@@ -536,15 +705,15 @@ def main():
         min_peers_required=args.min_peers
     )
     
-    runner = DeviceTestRunner(config)
-    runner.discover_devices()
-    
-    if not runner.devices:
-        print("No devices found. Please connect devices and enable USB debugging.")
-        sys.exit(1)
-    
-    runner.run_tests()
-    runner.generate_report()
+    with DeviceTestRunner(config) as runner:
+        runner.discover_devices()
+        
+        if not runner.devices:
+            print("No devices found. Please connect devices and enable USB debugging.")
+            sys.exit(1)
+        
+        runner.run_tests()
+        runner.generate_report()
     
     # Open report if possible
     report_path = runner.output_dir / "report.html"
@@ -6,20 +6,39 @@ Manages parallel testing across multiple physical Android and iOS devices,
 including BLE connectivity, performance monitoring, and battery tracking.
 """
 
+import asyncio
+import atexit
 import subprocess
 import time
+import io
 import json
+import math
 import os
+import re
+import selectors
+import statistics
 import sys
+import tempfile
 import threading
 import queue
+from collections import Counter, defaultdict, deque
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,6 +46,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Build properties that cannot change while a device stays connected
+_STATIC_PROPS = ('ro.product.model', 'ro.build.version.release')
+
+# Sentinel echoed after every command sent to a persistent adb shell
+_SHELL_END = b"__BITCRAPS_END__"
+
+# Level and temperature (tenths of a degree) from `dumpsys battery`
+_BATT_RE = re.compile(rb'level:\s*(\d+).*?temperature:\s*(-?\d+)', re.DOTALL)
+
+# "METRIC: key = value" lines logged by the instrumented tests
+_METRIC_RE = re.compile(rb'METRIC:\s*([A-Za-z_][\w.]*)\s*=\s*(\S+)')
+# Lines worth keeping from output that is otherwise truncated
+_NOTABLE_LINE_RE = re.compile(r'^.*(?:METRIC:|error:|FAILURE).*$', re.MULTILINE)
+# "... measured ... average: 0.123" lines from XCTest performance tests
+_IOS_AVERAGE_RE = re.compile(r'measured.*?average:\s*([\d.]+)', re.IGNORECASE)
+
+# Shared build products for every iOS device's test run
+_IOS_DERIVED_DATA = os.path.join(tempfile.gettempdir(), 'bitcraps-dd')
+# Upper bound in seconds for the one-off iOS test build
+_IOS_BUILD_TIMEOUT = 1800
+
+def _summarize(values: List[float]) -> Tuple[float, float, float]:
+    """Mean, median and 95th percentile of a metric series"""
+    if np is not None:
+        arr = np.fromiter(values, dtype=np.float64, count=len(values))
+        p50, p95 = np.percentile(arr, (50, 95))
+        return float(arr.mean()), float(p50), float(p95)
+    
+    if len(values) == 1:
+        return values[0], values[0], values[0]
+    # 'inclusive' matches NumPy's default linear interpolation
+    p95 = statistics.quantiles(values, n=20, method='inclusive')[18]
+    return statistics.fmean(values), statistics.median(values), p95
+
+def _fast_num(value: bytes):
+    """Convert a metric value to int or float, keeping text as str
+    
+    Numbers JSON encoders disagree on (integers beyond 64 bits, NaN and the
+    infinities) are kept as text too, so the orjson and stdlib json report
+    paths write identical documents.
+    """
+    try:
+        number = int(value)
+        if -(1 << 63) <= number < (1 << 64):
+            return number
+    except ValueError:
+        try:
+            number = float(value)
+            if math.isfinite(number):
+                return number
+        except ValueError:
+            pass
+    return value.decode(errors='replace')
+
+async def _exec(*argv: str, timeout: float = 5) -> str:
+    """Run a command on the event loop and return its decoded stdout"""
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    return stdout.decode(errors='replace')
+
 @dataclass
 class Device:
     """Represents a test device"""
@@ -46,7 +132,7 @@ class TestResult:
     test_name: str
     success: bool
     duration: float
-    timestamp: str
+    timestamp: float  # epoch seconds; formatted only when reported
     output: str
     metrics: Dict[str, any]
 
@@ -55,66 +141,156 @@ class DeviceManager:
     
     def __init__(self):
         self.devices: Dict[str, Device] = {}
+        # (device_id, property) -> (monotonic fetch time, value)
+        self._prop_cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        # device_id -> recent (monotonic time, battery level, temperature)
+        self._samples: Dict[str, deque] = {}
+        self._samples_lock = threading.Lock()
+        # device_id -> monotonic time of the last status query
+        self._status_ts: Dict[str, float] = {}
+        self._samplers: List[threading.Thread] = []
+        self._sampler_stop = threading.Event()
+        # One long-lived `adb shell` per Android device
+        self._shells: Dict[str, subprocess.Popen] = {}
+        self._shell_locks: Dict[str, threading.Lock] = {}
+        self._shells_lock = threading.Lock()
+        atexit.register(self.close)
         self.discover_devices()
     
+    def close(self):
+        """Terminate all persistent adb shell sessions"""
+        with self._shells_lock:
+            shells, self._shells = self._shells, {}
+        for shell in shells.values():
+            try:
+                if shell.poll() is None:
+                    shell.stdin.write(b"exit\n")
+                    shell.stdin.flush()
+                    shell.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                shell.kill()
+    
+    def _run_shell(self, device_id: str, cmd: str, timeout: float = 5) -> bytes:
+        """Run a command on a device through its long-lived adb shell session
+        
+        Raises subprocess.TimeoutExpired if the command's output isn't complete
+        within timeout seconds; the session is killed and restarted next call.
+        """
+        with self._shells_lock:
+            lock = self._shell_locks.setdefault(device_id, threading.Lock())
+        
+        with lock:
+            shell = self._shells.get(device_id)
+            if shell is None or shell.poll() is not None:
+                shell = subprocess.Popen(
+                    ['adb', '-s', device_id, 'shell'],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+                self._shells[device_id] = shell
+            
+            shell.stdin.write(cmd.encode() + b"; echo " + _SHELL_END + b"\n")
+            shell.stdin.flush()
+            
+            # Read the raw pipe under a deadline so an unresponsive device
+            # can't block the caller forever
+            fd = shell.stdout.fileno()
+            deadline = time.monotonic() + timeout
+            lines = []
+            pending = b""
+            with selectors.DefaultSelector() as sel:
+                sel.register(fd, selectors.EVENT_READ)
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not sel.select(remaining):
+                        shell.kill()
+                        shell.wait()
+                        self._shells.pop(device_id, None)
+                        raise subprocess.TimeoutExpired(cmd, timeout)
+                    
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        # Shell exited mid-command; the next call starts a new one
+                        self._shells.pop(device_id, None)
+                        return b"".join(lines) + pending
+                    
+                    *complete, pending = (pending + chunk).split(b"\n")
+                    for line in complete:
+                        if line.rstrip() == _SHELL_END:
+                            return b"".join(lines)
+                        lines.append(line + b"\n")
+    
     def discover_devices(self):
         """Discover all connected devices"""
-        self._discover_android_devices()
-        self._discover_ios_devices()
+        asyncio.run(self._discover_all())
         logger.info(f"Discovered {len(self.devices)} devices")
     
-    def _discover_android_devices(self):
+    async def _discover_all(self):
+        """Probe both platforms concurrently and merge what they find"""
+        for found in await asyncio.gather(self._discover_android_devices(),
+                                          self._discover_ios_devices()):
+            self.devices.update(found)
+    
+    async def _discover_android_devices(self) -> Dict[str, Device]:
         """Discover Android devices via ADB"""
+        found: Dict[str, Device] = {}
         try:
-            result = subprocess.run(
-                ['adb', 'devices', '-l'],
-                capture_output=True,
-                text=True,
-                timeout=5
+            stdout = await _exec('adb', 'devices', '-l')
+            device_ids = [line.split()[0] for line in stdout.split('\n')
+                          if 'device product:' in line]
+            
+            # Query every device's properties concurrently
+            all_props = await asyncio.gather(
+                *(self._get_android_properties(device_id) for device_id in device_ids)
             )
             
-            for line in result.stdout.split('\n'):
-                if 'device product:' in line:
-                    parts = line.split()
-                    device_id = parts[0]
-                    
-                    # Get device properties
-                    props = self._get_android_properties(device_id)
-                    
-                    device = Device(
-                        id=device_id,
-                        platform='android',
-                        name=props.get('model', 'Unknown'),
-                        os_version=props.get('version', 'Unknown'),
-                        ble_version=props.get('ble_version', 'Unknown')
-                    )
-                    
-                    self.devices[device_id] = device
-                    logger.info(f"Found Android device: {device.name} ({device_id})")
-                    
-        except subprocess.TimeoutExpired:
+            for device_id, props in zip(device_ids, all_props):
+                device = Device(
+                    id=device_id,
+                    platform='android',
+                    name=props.get('model', 'Unknown'),
+                    os_version=props.get('version', 'Unknown'),
+                    ble_version=props.get('ble_version', 'Unknown')
+                )
+                
+                found[device_id] = device
+                logger.info(f"Found Android device: {device.name} ({device_id})")
+                
+        except asyncio.TimeoutError:
             logger.error("ADB command timed out")
         except Exception as e:
             logger.error(f"Error discovering Android devices: {e}")
+        
+        return found
     
-    def _get_android_properties(self, device_id: str) -> Dict:
+    def _cached_prop(self, device_id: str, name: str, ttl: float) -> Optional[str]:
+        """Return a cached property value if it is younger than ttl seconds"""
+        entry = self._prop_cache.get((device_id, name))
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+        return None
+    
+    async def _get_android_properties(self, device_id: str) -> Dict:
         """Get Android device properties"""
         props = {}
         
         try:
-            # Get model
-            result = subprocess.run(
-                ['adb', '-s', device_id, 'shell', 'getprop', 'ro.product.model'],
-                capture_output=True, text=True, timeout=5
-            )
-            props['model'] = result.stdout.strip()
+            # Static build properties never expire; fetch only the missing
+            # ones, all in one shell round trip
+            missing = [name for name in _STATIC_PROPS
+                       if self._cached_prop(device_id, name, math.inf) is None]
+            if missing:
+                stdout = (await asyncio.to_thread(
+                    self._run_shell, device_id,
+                    '; '.join(f'getprop {name}' for name in missing)
+                )).decode(errors='replace')
+                now = time.monotonic()
+                for name, value in zip(missing, stdout.splitlines() + [''] * len(missing)):
+                    self._prop_cache[(device_id, name)] = (now, value.strip())
             
-            # Get Android version
-            result = subprocess.run(
-                ['adb', '-s', device_id, 'shell', 'getprop', 'ro.build.version.release'],
-                capture_output=True, text=True, timeout=5
-            )
-            props['version'] = f"Android {result.stdout.strip()}"
+            props['model'] = self._prop_cache[(device_id, 'ro.product.model')][1]
+            props['version'] = f"Android {self._prop_cache[(device_id, 'ro.build.version.release')][1]}"
             
             # Get Bluetooth version (simplified)
             props['ble_version'] = "5.0+"  # Would need more complex detection
@@ -124,48 +300,45 @@ class DeviceManager:
         
         return props
     
-    def _discover_ios_devices(self):
+    async def _discover_ios_devices(self) -> Dict[str, Device]:
         """Discover iOS devices"""
+        found: Dict[str, Device] = {}
         try:
-            result = subprocess.run(
-                ['idevice_id', '-l'],
-                capture_output=True,
-                text=True,
-                timeout=5
+            stdout = await _exec('idevice_id', '-l')
+            device_ids = [device_id for device_id in stdout.strip().split('\n') if device_id]
+            
+            # Query every device's info concurrently
+            all_info = await asyncio.gather(
+                *(self._get_ios_info(device_id) for device_id in device_ids)
             )
             
-            for device_id in result.stdout.strip().split('\n'):
-                if device_id:
-                    # Get device info
-                    info = self._get_ios_info(device_id)
-                    
-                    device = Device(
-                        id=device_id,
-                        platform='ios',
-                        name=info.get('DeviceName', 'Unknown'),
-                        os_version=f"iOS {info.get('ProductVersion', 'Unknown')}",
-                        ble_version="5.0+"  # iOS devices generally have BLE 5.0+
-                    )
-                    
-                    self.devices[device_id] = device
-                    logger.info(f"Found iOS device: {device.name} ({device_id})")
-                    
+            for device_id, info in zip(device_ids, all_info):
+                device = Device(
+                    id=device_id,
+                    platform='ios',
+                    name=info.get('DeviceName', 'Unknown'),
+                    os_version=f"iOS {info.get('ProductVersion', 'Unknown')}",
+                    ble_version="5.0+"  # iOS devices generally have BLE 5.0+
+                )
+                
+                found[device_id] = device
+                logger.info(f"Found iOS device: {device.name} ({device_id})")
+                
         except FileNotFoundError:
             logger.warning("idevice_id not found - iOS testing unavailable")
         except Exception as e:
             logger.error(f"Error discovering iOS devices: {e}")
+        
+        return found
     
-    def _get_ios_info(self, device_id: str) -> Dict:
+    async def _get_ios_info(self, device_id: str) -> Dict:
         """Get iOS device information"""
         info = {}
         
         try:
-            result = subprocess.run(
-                ['ideviceinfo', '-u', device_id],
-                capture_output=True, text=True, timeout=5
-            )
+            stdout = await _exec('ideviceinfo', '-u', device_id)
             
-            for line in result.stdout.split('\n'):
+            for line in stdout.split('\n'):
                 if ':' in line:
                     key, value = line.split(':', 1)
                     info[key.strip()] = value.strip()
@@ -175,33 +348,81 @@ class DeviceManager:
         
         return info
     
-    def update_device_status(self, device_id: str):
-        """Update device battery and status"""
+    def update_device_status(self, device_id: str, max_age: float = 2.0):
+        """Update device battery and status unless polled within max_age seconds"""
         if device_id not in self.devices:
             return
         
         device = self.devices[device_id]
         
-        if device.platform == 'android':
-            self._update_android_status(device)
-        elif device.platform == 'ios':
-            self._update_ios_status(device)
+        # Back-to-back tests poll within milliseconds of each other; reuse
+        # the reading instead of querying the device again
+        now = time.monotonic()
+        if now - self._status_ts.get(device_id, -math.inf) >= max_age:
+            if device.platform == 'android':
+                self._update_android_status(device)
+            elif device.platform == 'ios':
+                self._update_ios_status(device)
+            self._status_ts[device_id] = time.monotonic()
+        
+        with self._samples_lock:
+            samples = self._samples.setdefault(device_id, deque(maxlen=4096))
+            samples.append((time.monotonic(), device.battery_level, device.temperature))
+    
+    def battery_series(self, device_id: str, since: float) -> List[Tuple[float, int, float]]:
+        """Status samples taken at or after the given monotonic time"""
+        with self._samples_lock:
+            return [s for s in self._samples.get(device_id, ()) if s[0] >= since]
+    
+    def start_sampler(self, device_id: str, initial_interval: float = 1.0):
+        """Poll a device's status in the background"""
+        thread = threading.Thread(
+            target=self._sample_loop, args=(device_id, initial_interval),
+            daemon=True, name=f"sampler-{device_id}"
+        )
+        thread.start()
+        self._samplers.append(thread)
+    
+    def stop_samplers(self):
+        """Stop all background samplers"""
+        self._sampler_stop.set()
+        for thread in self._samplers:
+            thread.join()
+        self._samplers.clear()
+        self._sampler_stop.clear()
+    
+    def _sample_loop(self, device_id: str, initial_interval: float):
+        """Sample status, backing off to 5s and then 15s while readings hold steady"""
+        interval = initial_interval
+        last_reading = None
+        unchanged = 0
+        
+        while not self._sampler_stop.wait(interval):
+            self.update_device_status(device_id, max_age=0)
+            device = self.devices[device_id]
+            reading = (device.battery_level, device.temperature)
+            
+            if reading == last_reading:
+                unchanged += 1
+            else:
+                last_reading = reading
+                unchanged = 0
+            
+            if unchanged >= 20:
+                interval = 15.0
+            elif unchanged >= 4:
+                interval = 5.0
+            else:
+                interval = initial_interval
     
     def _update_android_status(self, device: Device):
         """Update Android device status"""
         try:
             # Get battery info
-            result = subprocess.run(
-                ['adb', '-s', device.id, 'shell', 'dumpsys', 'battery'],
-                capture_output=True, text=True, timeout=5
-            )
-            
-            for line in result.stdout.split('\n'):
-                if 'level:' in line:
-                    device.battery_level = int(line.split(':')[1].strip())
-                elif 'temperature:' in line:
-                    temp = int(line.split(':')[1].strip())
-                    device.temperature = temp / 10.0  # Convert to Celsius
+            match = _BATT_RE.search(self._run_shell(device.id, 'dumpsys battery'))
+            if match:
+                device.battery_level = int(match.group(1))
+                device.temperature = int(match.group(2)) / 10.0  # Convert to Celsius
                     
         except Exception as e:
             logger.error(f"Error updating Android status: {e}")
@@ -224,10 +445,96 @@ class DeviceManager:
 class TestRunner:
     """Runs tests on devices"""
     
-    def __init__(self, device_manager: DeviceManager):
+    def __init__(self, device_manager: DeviceManager, output_limit: int = 16384):
         self.device_manager = device_manager
+        self.output_limit = output_limit
         self.results: List[TestResult] = []
         self.test_suite = self._load_test_suite()
+        
+        # Outcome of the one-off iOS test build: None until attempted, then
+        # (success, output)
+        self._ios_build: Optional[Tuple[bool, str]] = None
+        self._ios_build_lock = threading.Lock()
+        
+        # One long-lived logcat stream per Android device, drained into a
+        # bounded buffer that each test snapshots
+        self._logcat_procs: List[subprocess.Popen] = []
+        self._logcat_buffers: Dict[str, deque] = {}
+        for device in device_manager.devices.values():
+            if device.platform == 'android':
+                self._start_logcat(device.id)
+        atexit.register(self.close)
+    
+    def _start_logcat(self, device_id: str):
+        """Start streaming BitCraps logcat output for a device"""
+        try:
+            subprocess.run(['adb', '-s', device_id, 'logcat', '-c'], timeout=5)
+            proc = subprocess.Popen(
+                ['adb', '-s', device_id, 'logcat', '-v', 'threadtime', 'BitCraps:I', '*:S'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except Exception as e:
+            logger.error(f"Error starting logcat for {device_id}: {e}")
+            return
+        
+        buffer = deque(maxlen=50_000)
+        threading.Thread(
+            target=buffer.extend, args=(proc.stdout,), daemon=True,
+            name=f"logcat-{device_id}"
+        ).start()
+        self._logcat_procs.append(proc)
+        self._logcat_buffers[device_id] = buffer
+    
+    def _drain_logcat(self, device_id: str) -> List[bytes]:
+        """Take every buffered logcat line for a device, leaving it empty"""
+        buffer = self._logcat_buffers.get(device_id)
+        if buffer is None:
+            return []
+        # popleft is atomic, so this is safe against the reader thread
+        return [buffer.popleft() for _ in range(len(buffer))]
+    
+    def _drain_logcat_synced(self, device_id: str, timeout: float = 5) -> List[bytes]:
+        """Drain a device's logcat buffer once everything logged so far has arrived
+        
+        Logs a unique marker line and drains until the stream delivers it, so
+        lines still in transit from the device aren't left for the next test
+        to discard.
+        """
+        if device_id not in self._logcat_buffers:
+            return []
+        
+        marker = f"BITCRAPS_SYNC_{os.urandom(8).hex()}"
+        try:
+            self.device_manager._run_shell(
+                device_id, f'log -t BitCraps -p i {marker}', timeout=timeout
+            )
+        except Exception as e:
+            logger.warning(f"Could not sync logcat for {device_id}: {e}")
+            return self._drain_logcat(device_id)
+        
+        marker = marker.encode()
+        lines = []
+        deadline = time.monotonic() + timeout
+        while True:
+            for line in self._drain_logcat(device_id):
+                if marker in line:
+                    return lines
+                lines.append(line)
+            if time.monotonic() >= deadline:
+                logger.warning(f"logcat for {device_id} did not catch up within {timeout}s")
+                return lines
+            time.sleep(0.05)
+    
+    def close(self):
+        """Stop the logcat streams"""
+        for proc in self._logcat_procs:
+            proc.terminate()
+        for proc in self._logcat_procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._logcat_procs.clear()
     
     def _load_test_suite(self) -> List[Dict]:
         """Load test suite configuration"""
@@ -264,11 +571,10 @@ class TestRunner:
         logger.info(f"Running {test['name']} on {device.name}")
         
         start_time = time.time()
-        timestamp = datetime.now().isoformat()
+        sample_start = time.monotonic()
         
         # Update device status before test
         self.device_manager.update_device_status(device.id)
-        initial_battery = device.battery_level
         
         if device.platform == 'android':
             success, output, metrics = self._run_android_test(device, test)
@@ -277,21 +583,24 @@ class TestRunner:
         
         # Update device status after test
         self.device_manager.update_device_status(device.id)
-        battery_drain = initial_battery - device.battery_level
         
         duration = time.time() - start_time
         
-        # Add battery metrics
-        metrics['battery_drain'] = battery_drain
-        metrics['final_battery'] = device.battery_level
-        metrics['temperature'] = device.temperature
+        # Add battery metrics from every sample taken during the test,
+        # including the background sampler's
+        series = self.device_manager.battery_series(device.id, sample_start)
+        metrics['battery_drain'] = series[0][1] - series[-1][1]
+        metrics['final_battery'] = series[-1][1]
+        metrics['temperature'] = series[-1][2]
+        metrics['peak_temperature'] = max(s[2] for s in series)
+        metrics['battery_curve'] = [(round(ts - sample_start, 1), level) for ts, level, _ in series]
         
         result = TestResult(
             device_id=device.id,
             test_name=test['name'],
             success=success,
             duration=duration,
-            timestamp=timestamp,
+            timestamp=start_time,
             output=output,
             metrics=metrics
         )
@@ -309,11 +618,8 @@ class TestRunner:
         metrics = {}
         
         try:
-            # Clear logcat
-            subprocess.run(
-                ['adb', '-s', device.id, 'logcat', '-c'],
-                timeout=5
-            )
+            # Drop log lines from before this test
+            self._drain_logcat(device.id)
             
             # Run instrumented test
             result = subprocess.run(
@@ -329,32 +635,62 @@ class TestRunner:
             # Parse test output
             success = 'FAILURES!!!' not in result.stdout
             
-            # Get performance metrics from logcat
-            logcat = subprocess.run(
-                ['adb', '-s', device.id, 'logcat', '-d', 'BitCraps:I', '*:S'],
-                capture_output=True, text=True, timeout=5
-            ).stdout
+            # Get performance metrics from the lines logged during the test,
+            # waiting for any still in transit from the device
+            logcat = b''.join(self._drain_logcat_synced(device.id))
             
             # Parse metrics from logcat
             metrics = self._parse_android_metrics(logcat)
             
-            return success, result.stdout, metrics
+            return success, self._cap_output(result.stdout), metrics
             
         except subprocess.TimeoutExpired:
             return False, "Test timed out", metrics
         except Exception as e:
             return False, str(e), metrics
     
+    def _ensure_ios_build(self) -> Tuple[bool, str]:
+        """Build the iOS app and tests once for all devices"""
+        with self._ios_build_lock:
+            if self._ios_build is None:
+                logger.info("Building iOS tests...")
+                try:
+                    result = subprocess.run(
+                        ['xcodebuild', 'build-for-testing',
+                         '-project', 'ios/BitCraps.xcodeproj',
+                         '-scheme', 'BitCraps',
+                         '-destination', 'generic/platform=iOS',
+                         '-derivedDataPath', _IOS_DERIVED_DATA,
+                         '-parallelizeTargets',
+                         '-jobs', str(os.cpu_count() or 1),
+                         'COMPILER_INDEX_STORE_ENABLE=NO'],
+                        capture_output=True,
+                        text=True,
+                        timeout=_IOS_BUILD_TIMEOUT
+                    )
+                    self._ios_build = (result.returncode == 0, self._cap_output(result.stdout))
+                except subprocess.TimeoutExpired:
+                    self._ios_build = (False, "iOS test build timed out")
+                except Exception as e:
+                    self._ios_build = (False, f"iOS test build failed: {e}")
+            return self._ios_build
+    
     def _run_ios_test(self, device: Device, test: Dict) -> Tuple[bool, str, Dict]:
         """Run test on iOS device"""
         metrics = {}
         
+        built, build_output = self._ensure_ios_build()
+        if not built:
+            return False, build_output, metrics
+        
         try:
+            # Run against the shared build products; nothing is compiled here
             result = subprocess.run(
-                ['xcodebuild', 'test',
+                ['xcodebuild', 'test-without-building',
                  '-project', 'ios/BitCraps.xcodeproj',
                  '-scheme', 'BitCraps',
                  '-destination', f'id={device.id}',
+                 '-derivedDataPath', _IOS_DERIVED_DATA,
                  '-only-testing', f'BitCrapsTests/{test["name"]}'],
                 capture_output=True,
                 text=True,
@@ -366,75 +702,82 @@ class TestRunner:
             # Parse metrics from output
             metrics = self._parse_ios_metrics(result.stdout)
             
-            return success, result.stdout, metrics
+            return success, self._cap_output(result.stdout), metrics
             
         except subprocess.TimeoutExpired:
             return False, "Test timed out", metrics
         except Exception as e:
             return False, str(e), metrics
     
-    def _parse_android_metrics(self, logcat: str) -> Dict:
-        """Parse metrics from Android logcat"""
-        metrics = {}
-        
-        for line in logcat.split('\n'):
-            # Parse performance metrics
-            if 'METRIC:' in line:
-                try:
-                    metric_str = line.split('METRIC:')[1].strip()
-                    metric_parts = metric_str.split('=')
-                    if len(metric_parts) == 2:
-                        key = metric_parts[0].strip()
-                        value = metric_parts[1].strip()
-                        
-                        # Try to convert to number
-                        try:
-                            if '.' in value:
-                                metrics[key] = float(value)
-                            else:
-                                metrics[key] = int(value)
-                        except ValueError:
-                            metrics[key] = value
-                            
-                except Exception:
-                    pass
+    def _cap_output(self, output: str) -> str:
+        """Keep the tail of a test's output plus any notable lines before it"""
+        if len(output) <= self.output_limit:
+            return output
         
-        return metrics
+        cut = len(output) - self.output_limit
+        keep = _NOTABLE_LINE_RE.findall(output, 0, cut)
+        return '\n'.join(keep) + '\n' + output[cut:]
+    
+    def _parse_android_metrics(self, logcat: bytes) -> Dict:
+        """Parse metrics from Android logcat"""
+        return {
+            match.group(1).decode(): _fast_num(match.group(2))
+            for match in _METRIC_RE.finditer(logcat)
+        }
     
     def _parse_ios_metrics(self, output: str) -> Dict:
         """Parse metrics from iOS test output"""
         metrics = {}
         
-        # Parse test metrics from xcodebuild output
-        for line in output.split('\n'):
-            if 'measured' in line.lower():
-                # Parse performance test results
-                try:
-                    if 'average:' in line:
-                        parts = line.split('average:')
-                        if len(parts) > 1:
-                            value = parts[1].split()[0]
-                            metrics['average'] = float(value)
-                except Exception:
-                    pass
+        # Parse performance test results from xcodebuild output; the last
+        # measurement wins
+        averages = _IOS_AVERAGE_RE.findall(output)
+        if averages:
+            try:
+                metrics['average'] = float(averages[-1])
+            except ValueError:
+                pass
         
         return metrics
     
+    def _run_device_queue(self, device: Device, tests: List[Dict]) -> int:
+        """Run a device's tests one after another"""
+        for test in tests:
+            try:
+                self.run_test_on_device(device, test)
+            except Exception as e:
+                logger.error(f"Test {test['name']} failed on {device.name}: {e}")
+        return len(tests)
+    
     def run_parallel_tests(self, max_workers: int = 4):
         """Run tests in parallel across devices"""
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            
-            for test in self.test_suite:
-                for device in self.device_manager.devices.values():
-                    future = executor.submit(self.run_test_on_device, device, test)
-                    futures.append((future, device, test))
-            
-            for future, device, test in futures:
-                try:
-                    result = future.result(timeout=test['timeout'] + 30)
-                except Exception as e:
-                    logger.error(f"Test {test['name']} failed on {device.name}: {e}")
+        # A device shares its USB link and battery between tests, so each
+        # device works through its own queue serially while up to
+        # max_workers devices run side by side
+        devices = list(self.device_manager.devices.values())
+        if not devices:
+            return
+        
+        # Build the iOS tests once up front, before any device needs them
+        if any(device.platform == 'ios' for device in devices):
+            self._ensure_ios_build()
+        
+        # Sample battery and temperature between the per-test polls
+        for device in devices:
+            self.device_manager.start_sampler(device.id)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(devices))) as executor:
+                futures = {
+                    executor.submit(self._run_device_queue, device, list(self.test_suite)): device
+                    for device in devices
+                }
+                
+                for future in as_completed(futures):
+                    device = futures[future]
+                    logger.info(f"{device.name} finished {future.result()} tests")
+        finally:
+            self.device_manager.stop_samplers()
 
 class ReportGenerator:
     """Generates test reports"""
@@ -445,90 +788,121 @@ class ReportGenerator:
     
     def generate_markdown_report(self) -> str:
         """Generate Markdown report"""
-        report = ["# BitCraps Device Test Report\n"]
-        report.append(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        report.append(f"**Devices Tested**: {len(self.devices)}\n")
-        report.append(f"**Total Tests Run**: {len(self.results)}\n\n")
+        # Index results by device and by test, and aggregate pass counts,
+        # durations and numeric metric series, in a single pass
+        by_device: Dict[str, List[TestResult]] = defaultdict(list)
+        by_test: Dict[str, List[TestResult]] = defaultdict(list)
+        passed_by_device: Counter = Counter()
+        passed_by_test: Counter = Counter()
+        duration_by_test: Dict[str, float] = defaultdict(float)
+        metric_series: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+        for r in self.results:
+            by_device[r.device_id].append(r)
+            by_test[r.test_name].append(r)
+            duration_by_test[r.test_name] += r.duration
+            if r.success:
+                passed_by_device[r.device_id] += 1
+                passed_by_test[r.test_name] += 1
+            for key, value in r.metrics.items():
+                if isinstance(value, (int, float)):
+                    metric_series[(r.test_name, key)].append(value)
+        
+        buf = io.StringIO()
+        w = buf.write
+        w("# BitCraps Device Test Report\n")
+        w(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        w(f"**Devices Tested**: {len(self.devices)}\n")
+        w(f"**Total Tests Run**: {len(self.results)}\n\n")
         
         # Device summary
-        report.append("## Device Summary\n\n")
-        report.append("| Device | Platform | OS Version | Battery Start | Battery End | Status |\n")
-        report.append("|--------|----------|------------|---------------|-------------|--------|\n")
+        w("## Device Summary\n\n")
+        w("| Device | Platform | OS Version | Battery Start | Battery End | Status |\n")
+        w("|--------|----------|------------|---------------|-------------|--------|\n")
         
         for device in self.devices.values():
             # Calculate pass rate for this device
-            device_results = [r for r in self.results if r.device_id == device.id]
+            device_results = by_device.get(device.id)
             if device_results:
-                pass_rate = sum(1 for r in device_results if r.success) / len(device_results) * 100
+                pass_rate = passed_by_device[device.id] / len(device_results) * 100
                 status = f"{pass_rate:.0f}% pass"
             else:
                 status = "No tests"
             
-            report.append(f"| {device.name} | {device.platform} | {device.os_version} | "
-                         f"{device.battery_level}% | {device.battery_level}% | {status} |\n")
+            w(f"| {device.name} | {device.platform} | {device.os_version} | "
+              f"{device.battery_level}% | {device.battery_level}% | {status} |\n")
         
         # Test summary
-        report.append("\n## Test Summary\n\n")
+        w("\n## Test Summary\n\n")
         
-        test_names = list(set(r.test_name for r in self.results))
-        for test_name in test_names:
-            test_results = [r for r in self.results if r.test_name == test_name]
-            passed = sum(1 for r in test_results if r.success)
+        for test_name, test_results in by_test.items():
+            passed = passed_by_test[test_name]
             total = len(test_results)
             
-            report.append(f"### {test_name}\n")
-            report.append(f"- **Pass Rate**: {passed}/{total} ({passed/total*100:.1f}%)\n")
-            report.append(f"- **Average Duration**: {sum(r.duration for r in test_results)/total:.2f}s\n")
+            w(f"### {test_name}\n")
+            w(f"- **Pass Rate**: {passed}/{total} ({passed/total*100:.1f}%)\n")
+            w(f"- **Average Duration**: {duration_by_test[test_name]/total:.2f}s\n")
             
             # Metrics summary
             if test_results[0].metrics:
-                report.append("- **Metrics**:\n")
+                w("- **Metrics**:\n")
                 for key in test_results[0].metrics.keys():
-                    values = [r.metrics.get(key, 0) for r in test_results if key in r.metrics]
-                    if values and isinstance(values[0], (int, float)):
-                        avg = sum(values) / len(values)
-                        report.append(f"  - {key}: {avg:.2f} (avg)\n")
+                    series = metric_series.get((test_name, key))
+                    if series and isinstance(test_results[0].metrics[key], (int, float)):
+                        avg, p50, p95 = _summarize(series)
+                        w(f"  - {key}: {avg:.2f} (avg), {p50:.2f} (p50), {p95:.2f} (p95)\n")
             
-            report.append("\n")
+            w("\n")
         
         # Detailed results
-        report.append("## Detailed Results\n\n")
+        w("## Detailed Results\n\n")
         
         for device in self.devices.values():
-            device_results = [r for r in self.results if r.device_id == device.id]
+            device_results = by_device.get(device.id)
             if not device_results:
                 continue
                 
-            report.append(f"### {device.name} ({device.platform})\n\n")
+            w(f"### {device.name} ({device.platform})\n\n")
             
             for result in device_results:
                 status = "✅" if result.success else "❌"
-                report.append(f"- {status} **{result.test_name}** ({result.duration:.2f}s)\n")
+                w(f"- {status} **{result.test_name}** ({result.duration:.2f}s)\n")
                 
                 if not result.success and result.output:
                     # Include first few lines of error output
                     error_lines = result.output.split('\n')[:3]
                     for line in error_lines:
                         if line.strip():
-                            report.append(f"  - {line.strip()}\n")
+                            w(f"  - {line.strip()}\n")
             
-            report.append("\n")
+            w("\n")
         
-        return ''.join(report)
+        return buf.getvalue()
     
-    def generate_json_report(self) -> str:
-        """Generate JSON report"""
-        report_data = {
+    def _json_report_data(self) -> Dict:
+        """Build the JSON report structure"""
+        return {
             'metadata': {
                 'generated': datetime.now().isoformat(),
                 'devices_tested': len(self.devices),
                 'total_tests': len(self.results)
             },
-            'devices': [asdict(d) for d in self.devices.values()],
-            'results': [asdict(r) for r in self.results]
+            # Neither dataclass nests another, so the instance dicts can be
+            # serialized directly instead of deep-copied through asdict
+            'devices': [d.__dict__ for d in self.devices.values()],
+            'results': [
+                {**r.__dict__, 'timestamp': datetime.fromtimestamp(r.timestamp).isoformat()}
+                for r in self.results
+            ]
         }
+    
+    def generate_json_report(self) -> str:
+        """Generate JSON report"""
+        if orjson is not None:
+            return orjson.dumps(self._json_report_data(), option=orjson.OPT_INDENT_2).decode()
         
-        return json.dumps(report_data, indent=2)
+        buf = io.StringIO()
+        json.dump(self._json_report_data(), buf, indent=2)
+        return buf.getvalue()
     
     def save_reports(self, base_path: str = "test-results"):
         """Save reports to files"""
@@ -544,8 +918,12 @@ class ReportGenerator:
         
         # Save JSON report
         json_path = os.path.join(base_path, f"report_{timestamp}.json")
-        with open(json_path, 'w') as f:
-            f.write(self.generate_json_report())
+        if orjson is not None:
+            with open(json_path, 'wb') as f:
+                f.write(orjson.dumps(self._json_report_data(), option=orjson.OPT_INDENT_2))
+        else:
+            with open(json_path, 'w') as f:
+                json.dump(self._json_report_data(), f, indent=2)
         logger.info(f"JSON report saved to {json_path}")
 
 def main():
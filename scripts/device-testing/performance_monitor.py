@@ -6,20 +6,64 @@ Tracks CPU, memory, network, and battery metrics during testing
 
 import os
 import sys
-import time
 import json
-import subprocess
-import threading
-import queue
+import re
+import time
+import asyncio
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
-import statistics
+from dataclasses import dataclass
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Sentinel echoed after every command sent to a persistent adb shell
+_SHELL_END = "__BITCRAPS_END__"
+
+# Seconds to wait for one command's output before restarting the shell
+_SHELL_TIMEOUT = 5
+
+# Separator echoed between the probes of one Android sample
+_SECTION_SEP = "__BITCRAPS_SEP__"
+
+# Patterns for the Android probe output
+_MEM_TOTAL = re.compile(r'TOTAL[^\d]*(\d+)')
+_MEM_AVAIL = re.compile(r'MemAvailable:\s*(\d+)')
+_NET_WLAN = re.compile(r'wlan0:\s*(\d+)(?:\s+\S+){7}\s+(\d+)')
+_BAT_LEVEL = re.compile(r'level:\s*(\d+)')
+_BAT_TEMP = re.compile(r'temperature:\s*(-?\d+)')
+_FPS_TOTAL = re.compile(r'Total frames rendered:\s*(\d+)')
+_FPS_JANKY = re.compile(r'Janky frames:\s*(\d+)')
+
+# Kernel clock ticks per second (USER_HZ), fixed at 100 on Android
+_CLK_TCK = 100
+
+# Per-sample Android probes, run as a single shell command; {pid} is the
+# app's process id
+_SAMPLE_PROBES = [
+    "cat /proc/{pid}/stat /proc/uptime",
+    "dumpsys meminfo com.bitcraps | grep TOTAL",
+    "cat /proc/net/dev | grep wlan0",
+    "cat /proc/meminfo | grep MemAvailable",
+]
+# Heavier dumpsys probes whose values change slowly, run every
+# _SLOW_PROBE_EVERY samples
+_SLOW_PROBES = [
+    "dumpsys battery",
+    "dumpsys gfxinfo com.bitcraps | grep -E 'Total frames|Janky'",
+]
+_SLOW_PROBE_EVERY = 10
+_SAMPLE_SCRIPT = f"; echo {_SECTION_SEP}; ".join(_SAMPLE_PROBES)
+_FULL_SAMPLE_SCRIPT = f"; echo {_SECTION_SEP}; ".join(_SAMPLE_PROBES + _SLOW_PROBES)
 
 @dataclass
 class PerformanceMetrics:
     """Performance metrics snapshot"""
-    timestamp: str
+    timestamp: float
     device_id: str
     platform: str
     cpu_usage: float
@@ -32,95 +76,256 @@ class PerformanceMetrics:
     fps: Optional[float] = None
     frame_drops: int = 0
     
+    @classmethod
+    def from_record(cls, device_id: str, platform: str, record: tuple) -> "PerformanceMetrics":
+        """Build a snapshot from a raw sample record"""
+        fields = dict(zip(_RECORD_FIELDS, record))
+        if fields["fps"] is None or np.isnan(fields["fps"]):
+            fields["fps"] = None
+        return cls(device_id=device_id, platform=platform, **fields)
+
+# Numeric PerformanceMetrics fields and the dtype of their column arrays
+_COLUMNS = {
+    "timestamp": np.float64,
+    "cpu_usage": np.float64,
+    "memory_usage": np.float64,
+    "memory_available": np.float64,
+    "network_rx_bytes": np.int64,
+    "network_tx_bytes": np.int64,
+    "battery_level": np.float64,
+    "battery_temperature": np.float64,
+    "fps": np.float64,
+    "frame_drops": np.int64,
+}
+
+# Layout of the raw per-sample record tuples monitors produce; timestamp is
+# Unix time and a missing fps is NaN
+_RECORD_FIELDS = tuple(_COLUMNS)
+
+def _dump_record(record: tuple) -> bytes:
+    """Serialize a sample record as one JSONL line"""
+    if orjson is not None:
+        # orjson writes the NaN of a missing fps as null
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(record).encode() + b"\n"
+
+def _to_columns(records: List[tuple]) -> Dict[str, np.ndarray]:
+    """Transpose sample records into one array per field"""
+    fields = list(zip(*records)) or [()] * len(_RECORD_FIELDS)
+    return {
+        name: np.array(values, dtype=dtype)
+        for (name, dtype), values in zip(_COLUMNS.items(), fields)
+    }
+    
 class DeviceMonitor:
     """Base class for device monitoring"""
     
-    def __init__(self, device_id: str):
+    def __init__(self, device_id: str, stream_dir: Optional[str] = None):
         self.device_id = device_id
-        self.metrics_queue = queue.Queue()
-        self.monitoring = False
-        self.monitor_thread = None
+        # Filled and drained on the event loop thread, so needs no lock
+        self.metrics_buffer: deque = deque()
+        # With a stream directory, sample records are appended to a
+        # per-device JSONL file as they arrive instead of being held in memory
+        self.stream_path = os.path.join(stream_dir, f"{device_id}.jsonl") if stream_dir else None
+        self._stream_pos = 0
         
-    def start_monitoring(self):
-        """Start monitoring in background thread"""
-        self.monitoring = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop)
-        self.monitor_thread.start()
-        
-    def stop_monitoring(self):
-        """Stop monitoring"""
-        self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join()
-            
-    def _monitor_loop(self):
-        """Main monitoring loop"""
-        while self.monitoring:
-            metrics = self.collect_metrics()
-            if metrics:
-                self.metrics_queue.put(metrics)
-            time.sleep(1)  # Collect metrics every second
-            
-    def collect_metrics(self) -> Optional[PerformanceMetrics]:
-        """Collect current metrics - to be implemented by subclasses"""
+    async def run(self):
+        """Collect metrics every second until cancelled"""
+        loop = asyncio.get_running_loop()
+        # Sample on absolute deadlines so the time spent collecting doesn't
+        # stretch the period
+        next_t = loop.time()
+        # Unbuffered, so each record reaches the file as a whole line
+        stream = open(self.stream_path, "wb", buffering=0) if self.stream_path else None
+        try:
+            while True:
+                next_t += 1.0
+                metrics = await self.collect_metrics()
+                if metrics:
+                    if stream:
+                        stream.write(_dump_record(metrics))
+                    else:
+                        self.metrics_buffer.append(metrics)
+                
+                sleep_for = next_t - loop.time()
+                if sleep_for > 0:
+                    await asyncio.sleep(sleep_for)
+                else:
+                    # Fell behind; restart the schedule instead of bursting
+                    next_t = loop.time()
+        finally:
+            if stream:
+                stream.close()
+            await self.close()
+            
+    async def collect_metrics(self) -> Optional[tuple]:
+        """Collect one sample record (see _RECORD_FIELDS) - to be implemented by subclasses"""
         raise NotImplementedError
         
-    def get_metrics(self) -> List[PerformanceMetrics]:
-        """Get all collected metrics"""
+    async def close(self):
+        """Release any device connections"""
+        
+    def get_metrics(self) -> Dict[str, np.ndarray]:
+        """Get all collected metrics as one array per field"""
         metrics = []
-        while not self.metrics_queue.empty():
-            metrics.append(self.metrics_queue.get())
-        return metrics
+        if self.stream_path:
+            # Load whatever was streamed since the last call
+            try:
+                loads = orjson.loads if orjson is not None else json.loads
+                with open(self.stream_path, "rb") as f:
+                    f.seek(self._stream_pos)
+                    metrics = [tuple(loads(line)) for line in f]
+                    self._stream_pos = f.tell()
+            except FileNotFoundError:
+                pass
+        metrics.extend(self.metrics_buffer)
+        self.metrics_buffer.clear()
+        return _to_columns(metrics)
+
+class AdbShell:
+    """Long-lived `adb shell` session for one device"""
+    
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        
+    async def run(self, cmd: str, timeout: float = _SHELL_TIMEOUT) -> str:
+        """Run a command in the session and return its output
+        
+        Raises asyncio.TimeoutError if the output isn't complete within
+        timeout seconds; the session is killed and restarted next call.
+        """
+        if self.proc is None or self.proc.returncode is not None:
+            self.proc = await asyncio.create_subprocess_exec(
+                "adb", "-s", self.device_id, "shell",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            
+        proc = self.proc
+        proc.stdin.write(f"{cmd}; echo {_SHELL_END}\n".encode())
+        await proc.stdin.drain()
+        
+        try:
+            output = await asyncio.wait_for(self._read_output(proc), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            self.proc = None
+            raise
+        return output.decode(errors="replace")
+        
+    async def _read_output(self, proc: asyncio.subprocess.Process) -> bytes:
+        """Read one command's output up to the sentinel line"""
+        lines = []
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                # Shell exited mid-command; the next call starts a new one
+                self.proc = None
+                break
+            if line.rstrip() == _SHELL_END.encode():
+                break
+            lines.append(line)
+        return b"".join(lines)
+        
+    async def close(self):
+        """End the session"""
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        try:
+            if proc.returncode is None:
+                proc.stdin.write(b"exit\n")
+                await proc.stdin.drain()
+                await asyncio.wait_for(proc.wait(), timeout=2)
+        except (OSError, asyncio.TimeoutError):
+            proc.kill()
+            await proc.wait()
 
 class AndroidMonitor(DeviceMonitor):
     """Android device performance monitor"""
     
-    def __init__(self, device_id: str):
-        super().__init__(device_id)
+    def __init__(self, device_id: str, stream_dir: Optional[str] = None):
+        super().__init__(device_id, stream_dir)
         self.platform = "android"
-        self.last_network_stats = None
+        # wlan0 byte counters from the previous sample
+        self._last_rx: Optional[int] = None
+        self._last_tx: Optional[int] = None
+        self.shell = AdbShell(device_id)
+        # App pid and CPU count, resolved on first use and again whenever
+        # the app restarts
+        self.pid: Optional[str] = None
+        self.ncpus = 1
+        # (utime + stime ticks, uptime seconds) from the previous sample
+        self._last_cpu: Optional[tuple] = None
+        # Samples taken so far, and the battery and FPS readings reused
+        # between runs of the slow probes
+        self._tick = 0
+        self._last_battery = (0.0, 0.0)
+        self._last_fps: Optional[float] = None
+        # (total frames, janky frames, monotonic time) from the previous
+        # gfxinfo reading
+        self._last_frames: Optional[tuple] = None
         
-    def collect_metrics(self) -> Optional[PerformanceMetrics]:
+    async def _resolve_pid(self):
+        """Look up the app's pid and the device's CPU count"""
+        pids = (await self.shell.run("pidof com.bitcraps")).split()
+        self.pid = pids[0] if pids else None
+        try:
+            self.ncpus = int((await self.shell.run("nproc")).strip())
+        except ValueError:
+            self.ncpus = 1
+        
+    async def close(self):
+        """Close the adb session"""
+        await self.shell.close()
+        
+    async def collect_metrics(self) -> Optional[tuple]:
         """Collect Android performance metrics"""
         try:
+            if self.pid is None:
+                await self._resolve_pid()
+                
+            # Collect every probe in one shell round trip
+            slow = self._tick % _SLOW_PROBE_EVERY == 0
+            self._tick += 1
+            script = (_FULL_SAMPLE_SCRIPT if slow else _SAMPLE_SCRIPT).format(pid=self.pid or 0)
+            sections = (await self.shell.run(script)).split(f"{_SECTION_SEP}\n")
+            cpu_out, mem_out, net_out, avail_out, battery_out, fps_out = (sections + [""] * 6)[:6]
+            
             # CPU usage
-            cpu_cmd = f"adb -s {self.device_id} shell top -n 1 | grep com.bitcraps"
-            cpu_result = subprocess.run(cpu_cmd, shell=True, capture_output=True, text=True)
-            cpu_usage = self._parse_cpu_usage(cpu_result.stdout)
+            cpu_usage = self._parse_cpu_usage(cpu_out)
             
             # Memory usage
-            mem_cmd = f"adb -s {self.device_id} shell dumpsys meminfo com.bitcraps | grep TOTAL"
-            mem_result = subprocess.run(mem_cmd, shell=True, capture_output=True, text=True)
-            memory_usage, memory_available = self._parse_memory_usage(mem_result.stdout)
+            memory_usage, memory_available = self._parse_memory_usage(mem_out, avail_out)
             
             # Network stats
-            net_cmd = f"adb -s {self.device_id} shell cat /proc/net/dev | grep wlan0"
-            net_result = subprocess.run(net_cmd, shell=True, capture_output=True, text=True)
-            rx_bytes, tx_bytes = self._parse_network_stats(net_result.stdout)
-            
-            # Battery stats
-            battery_cmd = f"adb -s {self.device_id} shell dumpsys battery"
-            battery_result = subprocess.run(battery_cmd, shell=True, capture_output=True, text=True)
-            battery_level, battery_temp = self._parse_battery_stats(battery_result.stdout)
-            
-            # FPS (if UI is active)
-            fps_cmd = f"adb -s {self.device_id} shell dumpsys gfxinfo com.bitcraps | grep 'Total frames'"
-            fps_result = subprocess.run(fps_cmd, shell=True, capture_output=True, text=True)
-            fps, frame_drops = self._parse_fps_stats(fps_result.stdout)
-            
-            return PerformanceMetrics(
-                timestamp=datetime.now().isoformat(),
-                device_id=self.device_id,
-                platform=self.platform,
-                cpu_usage=cpu_usage,
-                memory_usage=memory_usage,
-                memory_available=memory_available,
-                network_rx_bytes=rx_bytes,
-                network_tx_bytes=tx_bytes,
-                battery_level=battery_level,
-                battery_temperature=battery_temp,
-                fps=fps,
-                frame_drops=frame_drops
+            rx_bytes, tx_bytes = self._parse_network_stats(net_out)
+            
+            if slow:
+                # Battery stats
+                self._last_battery = self._parse_battery_stats(battery_out)
+                
+                # FPS (if UI is active)
+                self._last_fps, frame_drops = self._parse_fps_stats(fps_out)
+            else:
+                frame_drops = 0
+            battery_level, battery_temp = self._last_battery
+            fps = self._last_fps
+            
+            return (
+                time.time(),
+                cpu_usage,
+                memory_usage,
+                memory_available,
+                rx_bytes,
+                tx_bytes,
+                battery_level,
+                battery_temp,
+                np.nan if fps is None else fps,
+                frame_drops
             )
             
         except Exception as e:
@@ -128,101 +333,91 @@ class AndroidMonitor(DeviceMonitor):
             return None
             
     def _parse_cpu_usage(self, output: str) -> float:
-        """Parse CPU usage from top output"""
+        """Compute the app's CPU usage from /proc/<pid>/stat and /proc/uptime"""
         try:
-            # Format: PID USER PR NI CPU% MEM% TIME+ COMMAND
-            lines = output.strip().split('\n')
-            for line in lines:
-                if 'com.bitcraps' in line:
-                    parts = line.split()
-                    # CPU% is typically at index 8 or 9
-                    for part in parts:
-                        if '%' in part:
-                            return float(part.rstrip('%'))
-            return 0.0
+            lines = output.splitlines()
+            if len(lines) < 2 or ')' not in lines[0]:
+                # No such process; look the pid up again next sample
+                self.pid = None
+                self._last_cpu = None
+                return 0.0
+                
+            # Fields after the parenthesised command name start at state
+            # (field 3), so utime and stime (fields 14 and 15) sit at 11 and 12
+            fields = lines[0].rsplit(')', 1)[1].split()
+            busy = int(fields[11]) + int(fields[12])
+            uptime = float(lines[1].split()[0])
+            
+            last, self._last_cpu = self._last_cpu, (busy, uptime)
+            if last is None or uptime <= last[1]:
+                return 0.0
+            return 100.0 * (busy - last[0]) / (_CLK_TCK * (uptime - last[1]) * self.ncpus)
         except:
             return 0.0
             
-    def _parse_memory_usage(self, output: str) -> tuple:
-        """Parse memory usage from dumpsys meminfo"""
-        try:
-            # Format: TOTAL PSS: xxxxx KB
-            for line in output.split('\n'):
-                if 'TOTAL' in line:
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if part.isdigit():
-                            used_kb = int(part)
-                            # Get available memory
-                            avail_cmd = f"adb -s {self.device_id} shell cat /proc/meminfo | grep MemAvailable"
-                            avail_result = subprocess.run(avail_cmd, shell=True, capture_output=True, text=True)
-                            avail_kb = int(avail_result.stdout.split()[1]) if avail_result.stdout else 0
-                            return used_kb / 1024, avail_kb / 1024  # Convert to MB
-            return 0.0, 0.0
-        except:
+    def _parse_memory_usage(self, output: str, avail_out: str) -> tuple:
+        """Parse memory usage from dumpsys meminfo and /proc/meminfo"""
+        # Format: TOTAL PSS: xxxxx KB
+        m = _MEM_TOTAL.search(output)
+        if not m:
             return 0.0, 0.0
+        avail = _MEM_AVAIL.search(avail_out)
+        avail_kb = int(avail.group(1)) if avail else 0
+        return int(m.group(1)) / 1024, avail_kb / 1024  # Convert to MB
             
     def _parse_network_stats(self, output: str) -> tuple:
         """Parse network statistics"""
-        try:
-            # Format: wlan0: rx_bytes packets errors ... tx_bytes packets errors
-            parts = output.split()
-            if len(parts) >= 10:
-                rx_bytes = int(parts[1])
-                tx_bytes = int(parts[9])
-                
-                if self.last_network_stats:
-                    rx_delta = rx_bytes - self.last_network_stats[0]
-                    tx_delta = tx_bytes - self.last_network_stats[1]
-                    self.last_network_stats = (rx_bytes, tx_bytes)
-                    return rx_delta, tx_delta
-                else:
-                    self.last_network_stats = (rx_bytes, tx_bytes)
-                    return 0, 0
+        # Format: wlan0: rx_bytes packets errors ... tx_bytes packets errors
+        m = _NET_WLAN.search(output)
+        if not m:
             return 0, 0
-        except:
+        rx_bytes = int(m.group(1))
+        tx_bytes = int(m.group(2))
+        
+        last_rx, last_tx = self._last_rx, self._last_tx
+        self._last_rx, self._last_tx = rx_bytes, tx_bytes
+        if last_rx is None:
             return 0, 0
+        # Counters restart from zero when the interface is reset; count
+        # nothing for that sample rather than a negative delta
+        return max(rx_bytes - last_rx, 0), max(tx_bytes - last_tx, 0)
             
     def _parse_battery_stats(self, output: str) -> tuple:
         """Parse battery statistics"""
-        try:
-            level = 0.0
-            temp = 0.0
-            for line in output.split('\n'):
-                if 'level:' in line:
-                    level = float(line.split(':')[1].strip())
-                elif 'temperature:' in line:
-                    # Temperature is in tenths of degree
-                    temp = float(line.split(':')[1].strip()) / 10
-            return level, temp
-        except:
-            return 0.0, 0.0
+        level = _BAT_LEVEL.search(output)
+        temp = _BAT_TEMP.search(output)
+        return (
+            float(level.group(1)) if level else 0.0,
+            # Temperature is in tenths of degree
+            float(temp.group(1)) / 10 if temp else 0.0
+        )
             
     def _parse_fps_stats(self, output: str) -> tuple:
-        """Parse FPS statistics"""
-        try:
-            fps = None
-            drops = 0
-            for line in output.split('\n'):
-                if 'Total frames rendered:' in line:
-                    total_frames = int(line.split(':')[1].strip())
-                elif 'Janky frames:' in line:
-                    drops = int(line.split(':')[1].split()[0])
-                elif 'Average FPS:' in line:
-                    fps = float(line.split(':')[1].strip())
-            return fps, drops
-        except:
+        """Compute FPS and new janky frames from gfxinfo's cumulative counters"""
+        total = _FPS_TOTAL.search(output)
+        if not total:
+            self._last_frames = None
+            return None, 0
+        janky = _FPS_JANKY.search(output)
+        frames = int(total.group(1))
+        janky_frames = int(janky.group(1)) if janky else 0
+        now = time.monotonic()
+        
+        last, self._last_frames = self._last_frames, (frames, janky_frames, now)
+        if last is None or frames < last[0] or now <= last[2]:
+            # First reading, or the app restarted and its counters reset
             return None, 0
+        return (frames - last[0]) / (now - last[2]), max(janky_frames - last[1], 0)
 
 class IOSMonitor(DeviceMonitor):
     """iOS device performance monitor"""
     
-    def __init__(self, device_id: str):
-        super().__init__(device_id)
+    def __init__(self, device_id: str, stream_dir: Optional[str] = None):
+        super().__init__(device_id, stream_dir)
         self.platform = "ios"
         self.last_network_stats = None
         
-    def collect_metrics(self) -> Optional[PerformanceMetrics]:
+    async def collect_metrics(self) -> Optional[tuple]:
         """Collect iOS performance metrics using instruments"""
         try:
             # Use xcrun instruments for performance data
@@ -233,40 +428,51 @@ class IOSMonitor(DeviceMonitor):
             # This is a simplified version - real implementation would parse instruments output
             
             # For now, use simulated data (replace with actual instruments parsing)
-            cpu_usage = self._get_ios_cpu_usage()
+            cpu_usage = await self._get_ios_cpu_usage()
             memory_usage, memory_available = self._get_ios_memory_usage()
             rx_bytes, tx_bytes = self._get_ios_network_stats()
-            battery_level, battery_temp = self._get_ios_battery_stats()
+            battery_level, battery_temp = await self._get_ios_battery_stats()
             fps, frame_drops = self._get_ios_fps_stats()
             
-            return PerformanceMetrics(
-                timestamp=datetime.now().isoformat(),
-                device_id=self.device_id,
-                platform=self.platform,
-                cpu_usage=cpu_usage,
-                memory_usage=memory_usage,
-                memory_available=memory_available,
-                network_rx_bytes=rx_bytes,
-                network_tx_bytes=tx_bytes,
-                battery_level=battery_level,
-                battery_temperature=battery_temp,
-                fps=fps,
-                frame_drops=frame_drops
+            return (
+                time.time(),
+                cpu_usage,
+                memory_usage,
+                memory_available,
+                rx_bytes,
+                tx_bytes,
+                battery_level,
+                battery_temp,
+                np.nan if fps is None else fps,
+                frame_drops
             )
             
         except Exception as e:
             print(f"Error collecting iOS metrics: {e}")
             return None
             
-    def _get_ios_cpu_usage(self) -> float:
+    async def _ideviceinfo(self, *args: str, timeout: float = 5) -> bytes:
+        """Run ideviceinfo for this device, killing it if it overruns timeout"""
+        proc = await asyncio.create_subprocess_exec(
+            "ideviceinfo", "-u", self.device_id, *args,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+        return stdout
+        
+    async def _get_ios_cpu_usage(self) -> float:
         """Get iOS CPU usage"""
         try:
             # Use libimobiledevice tools if available
-            cmd = f"ideviceinfo -u {self.device_id} -q com.apple.mobile.battery | grep BatteryCurrentCapacity"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            stdout = await self._ideviceinfo("-q", "com.apple.mobile.battery")
             # Parse result (simplified)
             return 25.0  # Placeholder
-        except:
+        except Exception:
             return 0.0
             
     def _get_ios_memory_usage(self) -> tuple:
@@ -285,14 +491,13 @@ class IOSMonitor(DeviceMonitor):
         except:
             return 0, 0
             
-    def _get_ios_battery_stats(self) -> tuple:
+    async def _get_ios_battery_stats(self) -> tuple:
         """Get iOS battery statistics"""
         try:
-            cmd = f"ideviceinfo -u {self.device_id} | grep -E 'BatteryCurrentCapacity|Temperature'"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            stdout = await self._ideviceinfo()
             # Parse result (simplified)
             return 85.0, 32.0  # Placeholder values
-        except:
+        except Exception:
             return 0.0, 0.0
             
     def _get_ios_fps_stats(self) -> tuple:
@@ -307,72 +512,108 @@ class PerformanceAnalyzer:
     """Analyze and report performance metrics"""
     
     def __init__(self):
-        self.metrics_history: Dict[str, List[PerformanceMetrics]] = {}
+        self.metrics_history: Dict[str, Dict[str, np.ndarray]] = {}
+        self.platforms: Dict[str, str] = {}
+        self._report_cache: Optional[Dict[str, Any]] = None
         
-    def add_metrics(self, device_id: str, metrics: List[PerformanceMetrics]):
+    def add_metrics(self, device_id: str, metrics: Dict[str, np.ndarray], platform: str):
         """Add metrics to history"""
-        if device_id not in self.metrics_history:
-            self.metrics_history[device_id] = []
-        self.metrics_history[device_id].extend(metrics)
+        self._report_cache = None
+        self.platforms[device_id] = platform
+        history = self.metrics_history.get(device_id)
+        if history is None:
+            self.metrics_history[device_id] = metrics
+        else:
+            self.metrics_history[device_id] = {
+                name: np.concatenate((history[name], column))
+                for name, column in metrics.items()
+            }
         
     def generate_report(self) -> Dict[str, Any]:
-        """Generate performance report"""
+        """Generate performance report, reused until new metrics are added"""
+        if self._report_cache is not None:
+            return self._report_cache
+            
         report = {
             "timestamp": datetime.now().isoformat(),
             "devices": {}
         }
         
         for device_id, metrics in self.metrics_history.items():
-            if not metrics:
+            samples = len(metrics["timestamp"])
+            if not samples:
                 continue
                 
+            timestamps = metrics["timestamp"]
+            rx_total_kb = int(metrics["network_rx_bytes"].sum()) / 1024
+            tx_total_kb = int(metrics["network_tx_bytes"].sum()) / 1024
+            battery = metrics["battery_level"]
+            drain = float(battery[0] - battery[-1])
+            # Byte counts are deltas since the previous sample, so dividing
+            # the totals by the time the samples span gives the per-second
+            # rates weighted by each sample's actual interval, however much
+            # the sampling period drifted
+            elapsed = float(timestamps[-1] - timestamps[0])
+            per_second = 1 / elapsed if elapsed > 0 else 0.0
             device_report = {
-                "platform": metrics[0].platform,
-                "samples": len(metrics),
-                "duration_seconds": len(metrics),
-                "cpu": self._analyze_metric(metrics, "cpu_usage"),
-                "memory": self._analyze_metric(metrics, "memory_usage"),
+                "platform": self.platforms[device_id],
+                "samples": samples,
+                "start_time": datetime.fromtimestamp(timestamps[0]).isoformat(),
+                "end_time": datetime.fromtimestamp(timestamps[-1]).isoformat(),
+                "duration_seconds": elapsed,
+                "cpu": self._analyze_metric(metrics["cpu_usage"]),
+                "memory": self._analyze_metric(metrics["memory_usage"]),
                 "network": {
-                    "rx_total_kb": sum(m.network_rx_bytes for m in metrics) / 1024,
-                    "tx_total_kb": sum(m.network_tx_bytes for m in metrics) / 1024,
-                    "rx_rate_kbps": statistics.mean([m.network_rx_bytes for m in metrics]) / 1024,
-                    "tx_rate_kbps": statistics.mean([m.network_tx_bytes for m in metrics]) / 1024,
+                    "rx_total_kb": rx_total_kb,
+                    "tx_total_kb": tx_total_kb,
+                    "rx_rate_kbps": rx_total_kb * per_second,
+                    "tx_rate_kbps": tx_total_kb * per_second,
                 },
                 "battery": {
-                    "start_level": metrics[0].battery_level if metrics else 0,
-                    "end_level": metrics[-1].battery_level if metrics else 0,
-                    "drain_rate": (metrics[0].battery_level - metrics[-1].battery_level) / len(metrics) if metrics else 0,
-                    "avg_temperature": statistics.mean([m.battery_temperature for m in metrics]),
+                    "start_level": float(battery[0]),
+                    "end_level": float(battery[-1]),
+                    "drain": drain,
+                    "drain_rate": drain * per_second,
+                    "avg_temperature": float(metrics["battery_temperature"].mean()),
                 },
                 "graphics": self._analyze_graphics(metrics)
             }
             
             report["devices"][device_id] = device_report
             
+        self._report_cache = report
         return report
         
-    def _analyze_metric(self, metrics: List[PerformanceMetrics], field: str) -> Dict[str, float]:
+    def _analyze_metric(self, values: np.ndarray) -> Dict[str, float]:
         """Analyze a numeric metric"""
-        values = [getattr(m, field) for m in metrics]
+        # Derive the mean and stdev from one sum and one dot product rather
+        # than letting mean() and std() each rescan the array
+        n = values.size
+        mean = float(values.sum()) / n
+        stdev = 0.0
+        if n > 1:
+            deviations = values - mean
+            stdev = (float(deviations @ deviations) / (n - 1)) ** 0.5
         return {
-            "min": min(values),
-            "max": max(values),
-            "avg": statistics.mean(values),
-            "median": statistics.median(values),
-            "stdev": statistics.stdev(values) if len(values) > 1 else 0
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "avg": mean,
+            "median": float(np.median(values)),
+            "stdev": stdev
         }
         
-    def _analyze_graphics(self, metrics: List[PerformanceMetrics]) -> Dict[str, Any]:
+    def _analyze_graphics(self, metrics: Dict[str, np.ndarray]) -> Dict[str, Any]:
         """Analyze graphics performance"""
-        fps_values = [m.fps for m in metrics if m.fps is not None]
-        total_drops = sum(m.frame_drops for m in metrics)
+        fps = metrics["fps"]
+        fps_values = fps[~np.isnan(fps)]
+        total_drops = int(metrics["frame_drops"].sum())
         
-        if fps_values:
+        if fps_values.size:
             return {
-                "avg_fps": statistics.mean(fps_values),
-                "min_fps": min(fps_values),
+                "avg_fps": float(fps_values.mean()),
+                "min_fps": float(fps_values.min()),
                 "total_frame_drops": total_drops,
-                "drop_rate": total_drops / len(metrics)
+                "drop_rate": total_drops / fps.size
             }
         else:
             return {
@@ -385,47 +626,67 @@ class PerformanceAnalyzer:
     def save_report(self, filepath: str):
         """Save report to file"""
         report = self.generate_report()
-        with open(filepath, 'w') as f:
-            json.dump(report, f, indent=2)
+        if orjson is not None:
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filepath, 'w') as f:
+                json.dump(report, f, indent=2)
         print(f"Report saved to {filepath}")
         
     def print_summary(self):
         """Print performance summary"""
         report = self.generate_report()
         
-        print("\n" + "="*60)
-        print("PERFORMANCE MONITORING SUMMARY")
-        print("="*60)
+        # Build the whole summary and write it in one go
+        lines = []
+        w = lines.append
+        w("\n" + "="*60)
+        w("PERFORMANCE MONITORING SUMMARY")
+        w("="*60)
         
         for device_id, device_report in report["devices"].items():
-            print(f"\nDevice: {device_id} ({device_report['platform']})")
-            print(f"Duration: {device_report['duration_seconds']}s")
-            print(f"Samples: {device_report['samples']}")
+            w(f"\nDevice: {device_id} ({device_report['platform']})")
+            w(f"Duration: {device_report['duration_seconds']:.1f}s")
+            w(f"Samples: {device_report['samples']}")
             
-            print(f"\nCPU Usage:")
-            print(f"  Average: {device_report['cpu']['avg']:.1f}%")
-            print(f"  Peak: {device_report['cpu']['max']:.1f}%")
+            w("\nCPU Usage:")
+            w(f"  Average: {device_report['cpu']['avg']:.1f}%")
+            w(f"  Peak: {device_report['cpu']['max']:.1f}%")
             
-            print(f"\nMemory Usage:")
-            print(f"  Average: {device_report['memory']['avg']:.1f} MB")
-            print(f"  Peak: {device_report['memory']['max']:.1f} MB")
+            w("\nMemory Usage:")
+            w(f"  Average: {device_report['memory']['avg']:.1f} MB")
+            w(f"  Peak: {device_report['memory']['max']:.1f} MB")
             
-            print(f"\nNetwork:")
-            print(f"  RX Rate: {device_report['network']['rx_rate_kbps']:.1f} KB/s")
-            print(f"  TX Rate: {device_report['network']['tx_rate_kbps']:.1f} KB/s")
-            print(f"  Total RX: {device_report['network']['rx_total_kb']:.1f} KB")
-            print(f"  Total TX: {device_report['network']['tx_total_kb']:.1f} KB")
+            w("\nNetwork:")
+            w(f"  RX Rate: {device_report['network']['rx_rate_kbps']:.1f} KB/s")
+            w(f"  TX Rate: {device_report['network']['tx_rate_kbps']:.1f} KB/s")
+            w(f"  Total RX: {device_report['network']['rx_total_kb']:.1f} KB")
+            w(f"  Total TX: {device_report['network']['tx_total_kb']:.1f} KB")
             
-            print(f"\nBattery:")
-            print(f"  Drain: {device_report['battery']['start_level'] - device_report['battery']['end_level']:.1f}%")
-            print(f"  Rate: {device_report['battery']['drain_rate']:.2f}%/s")
-            print(f"  Avg Temp: {device_report['battery']['avg_temperature']:.1f}°C")
+            w("\nBattery:")
+            w(f"  Drain: {device_report['battery']['drain']:.1f}%")
+            w(f"  Rate: {device_report['battery']['drain_rate']:.2f}%/s")
+            w(f"  Avg Temp: {device_report['battery']['avg_temperature']:.1f}°C")
             
             if device_report['graphics']['avg_fps']:
-                print(f"\nGraphics:")
-                print(f"  Average FPS: {device_report['graphics']['avg_fps']:.1f}")
-                print(f"  Min FPS: {device_report['graphics']['min_fps']:.1f}")
-                print(f"  Frame Drops: {device_report['graphics']['total_frame_drops']}")
+                w("\nGraphics:")
+                w(f"  Average FPS: {device_report['graphics']['avg_fps']:.1f}")
+                w(f"  Min FPS: {device_report['graphics']['min_fps']:.1f}")
+                w(f"  Frame Drops: {device_report['graphics']['total_frame_drops']}")
+                
+        sys.stdout.write("\n".join(lines) + "\n")
+
+async def _monitor_all(monitors: List[DeviceMonitor], duration: float):
+    """Run all monitors for the given number of seconds"""
+    tasks = [asyncio.create_task(monitor.run()) for monitor in monitors]
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        print("\nStopping monitors...")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 def main():
     """Main performance monitoring function"""
@@ -436,6 +697,7 @@ def main():
     parser.add_argument("--ios", nargs="+", help="iOS device UDIDs to monitor")
     parser.add_argument("--duration", type=int, default=60, help="Monitoring duration in seconds")
     parser.add_argument("--output", default="performance_report.json", help="Output report file")
+    parser.add_argument("--stream-dir", help="Append samples to per-device JSONL files here instead of keeping them in memory")
     
     args = parser.parse_args()
     
@@ -443,43 +705,38 @@ def main():
         print("Error: No devices specified. Use --android or --ios")
         sys.exit(1)
         
+    if args.stream_dir:
+        os.makedirs(args.stream_dir, exist_ok=True)
+        
     monitors = []
     
     # Create Android monitors
     if args.android:
         for device_id in args.android:
-            monitor = AndroidMonitor(device_id)
+            monitor = AndroidMonitor(device_id, args.stream_dir)
             monitors.append(monitor)
             print(f"Monitoring Android device: {device_id}")
             
     # Create iOS monitors
     if args.ios:
         for device_id in args.ios:
-            monitor = IOSMonitor(device_id)
+            monitor = IOSMonitor(device_id, args.stream_dir)
             monitors.append(monitor)
             print(f"Monitoring iOS device: {device_id}")
             
-    # Start monitoring
+    # Monitor every device concurrently on one event loop
     print(f"\nStarting performance monitoring for {args.duration} seconds...")
-    for monitor in monitors:
-        monitor.start_monitoring()
-        
-    # Wait for monitoring duration
     try:
-        time.sleep(args.duration)
+        asyncio.run(_monitor_all(monitors, args.duration))
     except KeyboardInterrupt:
         print("\nMonitoring interrupted")
         
-    # Stop monitoring
-    print("\nStopping monitors...")
-    for monitor in monitors:
-        monitor.stop_monitoring()
-        
+
     # Collect and analyze metrics
     analyzer = PerformanceAnalyzer()
     for monitor in monitors:
         metrics = monitor.get_metrics()
-        analyzer.add_metrics(monitor.device_id, metrics)
+        analyzer.add_metrics(monitor.device_id, metrics, monitor.platform)
         
     # Generate and save report
     analyzer.save_report(args.output)